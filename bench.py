@@ -0,0 +1,342 @@
+# bench.py
+import os
+import io
+import sys
+import json
+import time
+import random
+import shutil
+import platform
+import tempfile
+import contextlib
+import statistics
+import tracemalloc
+from typing import Dict, List, Optional
+
+# Échelle par défaut du dépôt synthétique
+DEFAULT_SCALE = {
+    'files': 200,       # fichiers suivis
+    'file_size': 4096,  # taille approximative d'un fichier (octets)
+    'commits': 50,      # commits sur main après le commit initial
+    'branches': 4,      # branches créées puis fusionnées dans main
+    'divergence': 5,    # commits propres à chaque branche
+    'seed': 42,         # graine : même dépôt, même charge à chaque run
+}
+# Étapes mesurées, dans l'ordre du scénario
+STEPS = (
+    'init', 'add', 'commit', 'status', 'branch create', 'branch switch',
+    'merge', 'status dirty', 'log', 'graph',
+)
+FILES_PER_DIR = 50
+# Part des fichiers modifiés par un commit de main
+EDIT_RATIO = 0.05
+WORDS = (
+    'alpha', 'beta', 'gamma', 'delta', 'epsilon', 'zeta', 'eta', 'theta',
+    'iota', 'kappa', 'lambda', 'mu', 'nu', 'xi', 'omicron', 'pi', 'rho',
+    'sigma', 'tau', 'upsilon', 'phi', 'chi', 'psi', 'omega',
+)
+
+
+def io_counters() -> Optional[Dict[str, int]]:
+    """Octets lus / écrits par le processus (appels read/write, cache
+    compris), d'après /proc/self/io ; None hors de Linux."""
+    try:
+        with open('/proc/self/io') as f:
+            fields = dict(line.split(': ') for line in f.read().splitlines())
+    except OSError:
+        return None
+    return {'read': int(fields['rchar']), 'written': int(fields['wchar'])}
+
+
+def max_rss_kb() -> Optional[int]:
+    """Pic de mémoire résidente du processus (Ko), POSIX seulement."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Octets sous macOS, Ko ailleurs
+    return rss // 1024 if sys.platform == 'darwin' else rss
+
+
+class _Discard(io.TextIOBase):
+    """Sortie des commandes jetée : ni affichage ni mémoire."""
+
+    def write(self, text: str) -> int:
+        return len(text)
+
+
+class StepRecorder:
+    """
+    Cumule, par étape : nombre d'appels, durée, octets lus et écrits
+    et, si `trace_memory`, pic d'allocations Python (tracemalloc)
+    au-dessus de la mémoire déjà allouée au début de l'appel.
+    """
+
+    def __init__(self, trace_memory: bool = False):
+        self.trace_memory = trace_memory
+        self.steps: Dict[str, Dict] = {}
+
+    @contextlib.contextmanager
+    def step(self, name: str):
+        stats = self.steps.setdefault(name, {
+            'calls': 0, 'seconds': 0.0, 'read_bytes': 0,
+            'written_bytes': 0, 'peak_bytes': 0,
+        })
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+        before = io_counters()
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(_Discard()):
+            yield
+        stats['seconds'] += time.perf_counter() - start
+        after = io_counters()
+        stats['calls'] += 1
+        if before is not None and after is not None:
+            stats['read_bytes'] += after['read'] - before['read']
+            stats['written_bytes'] += after['written'] - before['written']
+        if self.trace_memory:
+            peak = tracemalloc.get_traced_memory()[1] - baseline
+            stats['peak_bytes'] = max(stats['peak_bytes'], peak)
+
+
+class SyntheticRepo:
+    """
+    Génère et fait évoluer un dépôt à l'échelle demandée en passant par
+    le shell (EnhancedCLI.onecmd) : la charge mesurée est celle d'un
+    utilisateur, commandes, VersionControl et BranchManager compris.
+    Le contenu est tiré d'un générateur pseudo-aléatoire initialisé par
+    `seed` : deux runs produisent les mêmes fichiers et modifications.
+    """
+
+    def __init__(self, path: str, scale: Dict, recorder: StepRecorder):
+        self.path = path
+        self.scale = scale
+        self.recorder = recorder
+        self.rng = random.Random(scale['seed'])
+        self.files = [
+            f"d{i // FILES_PER_DIR:03d}/f{i:05d}.txt"
+            for i in range(scale['files'])
+        ]
+        self.cli = None
+        self.commit_count = 0
+
+    def run(self, step: str, line: str):
+        """Exécute une commande du shell ; une commande en échec
+        interrompt le benchmark (on ne mesure pas une erreur)."""
+        with self.recorder.step(step):
+            self.cli.onecmd(line)
+        if self.cli.exit_code:
+            raise RuntimeError(f"Échec de la commande : {line}")
+
+    def _text(self, size: int) -> str:
+        lines = []
+        total = 0
+        while total < size:
+            line = ' '.join(self.rng.choices(WORDS, k=8)) + '\n'
+            lines.append(line)
+            total += len(line)
+        return ''.join(lines)
+
+    def _write(self, name: str, content: str):
+        full_path = os.path.join(self.path, name)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+
+    def _edit(self, name: str):
+        """Remplace une ligne au hasard (les fusions restent ligne à
+        ligne, comme sur un vrai projet)."""
+        with open(os.path.join(self.path, name), encoding='utf-8') as f:
+            lines = f.readlines()
+        lines[self.rng.randrange(len(lines))] = self._text(1)
+        self._write(name, ''.join(lines))
+
+    def _commit(self, names: List[str]):
+        for name in names:
+            self._edit(name)
+        self.run('add', 'add ' + ' '.join(names))
+        self.commit_count += 1
+        self.run('commit', f'commit "bench commit {self.commit_count}"')
+
+    def build(self):
+        """Scénario complet : création, historique, branches, fusions,
+        puis lectures (status, log, graph)."""
+        from cli import EnhancedCLI
+
+        scale = self.scale
+        with self.recorder.step('init'):
+            self.cli = EnhancedCLI()
+            self.cli.onecmd('init')
+        for name in self.files:
+            self._write(name, self._text(scale['file_size']))
+        self.run('add', 'add .')
+        self.run('commit', 'commit "bench commit initial"')
+
+        per_commit = max(1, int(len(self.files) * EDIT_RATIO))
+        for _ in range(scale['commits']):
+            self._commit(self.rng.sample(self.files, per_commit))
+        self.run('status', 'status')
+
+        # Chaque branche modifie sa propre tranche de fichiers, main la
+        # tranche 0 : fusions à trois voies, sans conflit
+        slices = scale['branches'] + 1
+        branches = [f"bench-{b}" for b in range(scale['branches'])]
+        for b, branch in enumerate(branches, start=1):
+            own = self.files[b::slices] or self.files
+            self.run('branch create', f'branch create {branch}')
+            self.run('branch switch', f'branch switch {branch}')
+            for _ in range(scale['divergence']):
+                self._commit(self.rng.sample(own, min(per_commit, len(own))))
+            self.run('branch switch', 'branch switch main')
+        if branches:
+            self._commit(self.files[0::slices][:per_commit])
+        for branch in branches:
+            # Sans conflit, le merge crée lui-même le commit de fusion
+            self.run('merge', f'merge {branch} --no-interactive')
+
+        for name in self.rng.sample(self.files, per_commit):
+            self._edit(name)
+        self.run('status dirty', 'status')
+        self.run('log', 'log')
+        self.run('graph', 'graph')
+
+
+def run_once(scale: Dict, trace_memory: bool = False,
+             keep: Optional[str] = None) -> Dict[str, Dict]:
+    """Construit un dépôt dans un répertoire temporaire (ou `keep`) et
+    renvoie les mesures par étape."""
+    import colors
+    colors.set_enabled(False)
+
+    path = keep or tempfile.mkdtemp(prefix='mini_vcs_bench_')
+    os.makedirs(path, exist_ok=True)
+    previous = os.getcwd()
+    recorder = StepRecorder(trace_memory)
+    if trace_memory:
+        tracemalloc.start()
+    try:
+        # Les commandes travaillent sur le répertoire courant
+        os.chdir(path)
+        SyntheticRepo(path, scale, recorder).build()
+    finally:
+        if trace_memory:
+            tracemalloc.stop()
+        os.chdir(previous)
+        if keep is None:
+            shutil.rmtree(path, ignore_errors=True)
+    return recorder.steps
+
+
+def _source_version() -> Optional[str]:
+    """Commit git de l'arbre mesuré, si disponible."""
+    import subprocess
+    try:
+        out = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, timeout=5
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def benchmark(scale: Dict, repeat: int = 1, memory: bool = True,
+              keep: Optional[str] = None) -> Dict:
+    """
+    Lance `repeat` runs chronométrés (durée minimale et médiane par
+    étape), puis un run identique sous tracemalloc pour la mémoire :
+    le traçage ralentit les allocations et fausserait les durées.
+    """
+    runs = [run_once(scale, keep=keep if i == repeat - 1 else None)
+            for i in range(repeat)]
+    traced = run_once(scale, trace_memory=True) if memory else None
+
+    steps = {}
+    for name in STEPS:
+        samples = [run[name]['seconds'] for run in runs if name in run]
+        if not samples:
+            continue
+        last = runs[-1][name]
+        steps[name] = {
+            'calls': last['calls'],
+            'seconds': min(samples),
+            'median_seconds': statistics.median(samples),
+            'read_bytes': last['read_bytes'],
+            'written_bytes': last['written_bytes'],
+            'peak_bytes': traced[name]['peak_bytes'] if traced else None,
+        }
+    return {
+        'version': {
+            'source': _source_version(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+        },
+        'scale': scale,
+        'repeat': repeat,
+        'steps': steps,
+        'max_rss_kb': max_rss_kb(),
+    }
+
+
+def compare(old: Dict, new: Dict) -> str:
+    """Tableau des durées de deux résultats (ratio nouveau / ancien)."""
+    lines = [f"{'étape':<15}{'avant (ms)':>12}{'après (ms)':>12}"
+             f"{'ratio':>8}"]
+    for name, stats in new['steps'].items():
+        before = old.get('steps', {}).get(name)
+        after_ms = stats['seconds'] * 1000
+        if not before:
+            lines.append(f"{name:<15}{'-':>12}{after_ms:>12.1f}{'-':>8}")
+            continue
+        before_ms = before['seconds'] * 1000
+        ratio = after_ms / before_ms if before_ms else float('inf')
+        lines.append(f"{name:<15}{before_ms:>12.1f}{after_ms:>12.1f}"
+                     f"{ratio:>8.2f}")
+    return '\n'.join(lines)
+
+
+def main(argv=None) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Benchmark de Mini VCS sur un dépôt synthétique "
+                    "(résultats JSON)"
+    )
+    for key, value in DEFAULT_SCALE.items():
+        parser.add_argument(f"--{key.replace('_', '-')}", type=int,
+                            default=value, dest=key)
+    parser.add_argument('--repeat', type=int, default=1,
+                        help="Runs chronométrés (durée minimale gardée)")
+    parser.add_argument('--no-memory', action='store_true',
+                        help="Pas de run tracemalloc (plus rapide)")
+    parser.add_argument('--output', '-o',
+                        help="Fichier JSON (sortie standard par défaut)")
+    parser.add_argument('--compare', metavar='ANCIEN.json',
+                        help="Compare les durées à un résultat précédent")
+    parser.add_argument('--keep', metavar='DOSSIER',
+                        help="Garde le dépôt généré dans DOSSIER")
+    args = parser.parse_args(argv)
+    if args.repeat < 1:
+        parser.error("--repeat doit valoir au moins 1")
+
+    scale = {key: getattr(args, key) for key in DEFAULT_SCALE}
+    keep = os.path.abspath(args.keep) if args.keep else None
+    result = benchmark(scale, args.repeat, not args.no_memory, keep)
+
+    text = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            print(compare(json.load(f), result), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,204 @@
+# bitmaps.py
+import os
+import zlib
+import struct
+from typing import Dict, List, Optional, Tuple
+
+from commitgraph import CommitGraph
+from fsutil import atomic_write
+
+BITMAP_MAGIC = b'MVBM'
+BITMAP_VERSION = 1
+
+# magic, version, nombre d'enregistrements du commit-graph couverts, id
+# du dernier d'entre eux, nombre d'entrées
+HEADER = struct.Struct('>4sII20sI')
+# longueur du nom, tête (SHA-1 binaire), position de la tête, longueur du
+# bitmap compressé ; suivis du nom (UTF-8) et du bitmap
+ENTRY = struct.Struct('>H20sII')
+
+
+def bit_positions(bitmap: int) -> List[int]:
+    """Positions des bits à 1 d'un bitmap, par ordre croissant."""
+    positions = []
+    data = bitmap.to_bytes((bitmap.bit_length() + 7) // 8, 'little')
+    for i, byte in enumerate(data):
+        while byte:
+            low = byte & -byte
+            positions.append(i * 8 + low.bit_length() - 1)
+            byte ^= low
+    return positions
+
+
+class ReachabilityBitmaps:
+    """
+    Bitmaps d'accessibilité des têtes de branche (fichier bitmaps).
+    Le bit i du bitmap d'un commit vaut 1 si le commit en position i du
+    commit-graph est lui-même ou l'un de ses ancêtres : `A..B`, « X
+    est-elle fusionnée ? » ou le test de fast-forward deviennent des
+    opérations bit à bit sur des entiers Python, sans parcours.
+
+    Un bitmap par branche est stocké, compressé (zlib) ; il est
+    décompressé à la demande. Quand une branche avance, seuls les
+    nouveaux commits sont parcourus : la descente s'arrête sur toute
+    tête déjà connue, dont le bitmap est réutilisé tel quel.
+    """
+
+    def __init__(self, vcs_dir: str, graph: CommitGraph):
+        self.path = os.path.join(vcs_dir, 'bitmaps')
+        self.graph = graph
+        self._stamp = None
+        # Taille du commit-graph quand les caches ont été remplis
+        self._covered = 0
+        # branche -> (id de la tête, position dans le commit-graph)
+        self._entries: Dict[str, Tuple[str, int]] = {}
+        # position -> bitmap compressé (têtes) / décompressé (cache)
+        self._blobs: Dict[int, bytes] = {}
+        self._bitmaps: Dict[int, int] = {}
+
+    def _file_stamp(self) -> Optional[Tuple]:
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def _load(self):
+        """Relit le fichier s'il a changé. Les entrées qui ne
+        correspondent plus au commit-graph (reconstruit par gc, par
+        exemple) sont ignorées."""
+        stamp = self._file_stamp()
+        covered = len(self.graph)
+        # Un commit-graph qui a rétréci a été reconstruit : les positions
+        # mémorisées ne valent plus rien
+        if stamp == self._stamp and covered >= self._covered:
+            return
+        self._entries, self._blobs, self._bitmaps = {}, {}, {}
+        self._stamp = stamp
+        self._covered = covered
+        if stamp is None:
+            return
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        if len(data) < HEADER.size:
+            return
+        magic, _version, covered, last_id, count = HEADER.unpack_from(data)
+        if magic != BITMAP_MAGIC or not self._covers(covered, last_id):
+            return
+        offset = HEADER.size
+        for _ in range(count):
+            name_len, tip, position, blob_len = ENTRY.unpack_from(
+                data, offset
+            )
+            offset += ENTRY.size
+            name = data[offset:offset + name_len].decode('utf-8')
+            offset += name_len
+            blob = data[offset:offset + blob_len]
+            offset += blob_len
+            self._entries[name] = (tip.hex(), position)
+            self._blobs[position] = blob
+
+    def _covers(self, covered: int, last_id: bytes) -> bool:
+        """Vrai si le commit-graph actuel prolonge celui des bitmaps
+        (même enregistrement en dernière position couverte)."""
+        if covered > len(self.graph):
+            return False
+        return not covered or (
+            self.graph.record(covered - 1).id == last_id.hex()
+        )
+
+    def _save(self):
+        covered = len(self.graph)
+        last_id = (bytes.fromhex(self.graph.record(covered - 1).id)
+                   if covered else bytes(20))
+        parts = [HEADER.pack(BITMAP_MAGIC, BITMAP_VERSION, covered, last_id,
+                             len(self._entries))]
+        for name, (tip, position) in sorted(self._entries.items()):
+            blob = self._blobs.get(position)
+            if blob is None:
+                bitmap = self.bitmap(position)
+                blob = zlib.compress(
+                    bitmap.to_bytes((bitmap.bit_length() + 7) // 8, 'little')
+                )
+                self._blobs[position] = blob
+            encoded = name.encode('utf-8')
+            parts.append(ENTRY.pack(len(encoded), bytes.fromhex(tip),
+                                    position, len(blob)))
+            parts += [encoded, blob]
+        # Simple cache : pas de verrou, un écrivain concurrent produit un
+        # fichier tout aussi valide (remplacement atomique)
+        atomic_write(self.path, b''.join(parts), fsync=False)
+        self._stamp = self._file_stamp()
+
+    def clear(self):
+        """Oublie tous les bitmaps (commit-graph reconstruit)."""
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self._entries, self._blobs, self._bitmaps = {}, {}, {}
+        self._stamp = None
+        self._covered = 0
+
+    def sync(self, refs: Dict[str, Optional[str]]) -> Dict[str, int]:
+        """
+        Met les bitmaps en accord avec `refs` (branche -> commit) et
+        renvoie la position de chaque tête. Seules les branches qui ont
+        bougé sont recalculées, et le fichier n'est réécrit que si
+        quelque chose a changé.
+        """
+        self._load()
+        wanted = {name: tip for name, tip in refs.items() if tip}
+        known = {tip: position for tip, position in self._entries.values()}
+        stale = [tip for name, tip in wanted.items()
+                 if self._entries.get(name, (None,))[0] != tip
+                 and tip not in known]
+        if stale:
+            known.update(self.graph.positions(stale))
+
+        entries = {name: (tip, known[tip])
+                   for name, tip in wanted.items() if tip in known}
+        if entries != self._entries:
+            self._entries = entries
+            self._save()
+        return {name: position for name, (_, position) in entries.items()}
+
+    def bitmap(self, position: int) -> int:
+        """Bitmap des ancêtres du commit en `position` (lui compris)."""
+        self._load()
+        bitmap = self._bitmaps.get(position)
+        if bitmap is not None:
+            return bitmap
+        blob = self._blobs.get(position)
+        if blob is not None:
+            bitmap = int.from_bytes(zlib.decompress(blob), 'little')
+        else:
+            bitmap = self._compute(position)
+        self._bitmaps[position] = bitmap
+        return bitmap
+
+    def reaches(self, descendant: int, ancestor: int) -> bool:
+        """Vrai si le commit en `ancestor` est accessible depuis celui en
+        `descendant` (positions)."""
+        return bool(self.bitmap(descendant) >> ancestor & 1)
+
+    def _compute(self, position: int) -> int:
+        """
+        Parcours des ancêtres de `position`. Une tête dont le bitmap est
+        connu arrête la descente : ses bits sont ajoutés d'un coup.
+        """
+        size = (len(self.graph) + 7) // 8
+        bits = bytearray(size)
+        shortcuts = set(self._blobs) | set(self._bitmaps)
+        stack = [position]
+        while stack:
+            current = stack.pop()
+            if bits[current >> 3] >> (current & 7) & 1:
+                continue
+            if current != position and current in shortcuts:
+                known = self.bitmap(current)
+                bits = bytearray((
+                    int.from_bytes(bits, 'little') | known
+                ).to_bytes(size, 'little'))
+                continue
+            bits[current >> 3] |= 1 << (current & 7)
+            stack.extend(self.graph.record(current).parents)
+        return int.from_bytes(bits, 'little')
@@ -0,0 +1,81 @@
+# blame.py
+import os
+import json
+import shutil
+import hashlib
+from typing import Dict, List, Tuple
+
+from fsutil import atomic_write
+
+BLAME_VERSION = 1
+
+# Origines des lignes d'un fichier à un commit : (hash du blob, liste de
+# l'identifiant du commit d'origine de chaque ligne)
+Origins = Tuple[str, List[str]]
+
+
+def encode_runs(origins: List[str]) -> List[list]:
+    """Liste d'origines -> [[commit, nombre de lignes], ...] : les lignes
+    consécutives d'un même commit tiennent en une entrée."""
+    runs = []
+    for origin in origins:
+        if runs and runs[-1][0] == origin:
+            runs[-1][1] += 1
+        else:
+            runs.append([origin, 1])
+    return runs
+
+
+def decode_runs(runs: List[list]) -> List[str]:
+    origins = []
+    for origin, size in runs:
+        origins.extend([origin] * size)
+    return origins
+
+
+class BlameCache:
+    """
+    Origines des lignes déjà calculées par `blame`, sur le disque
+    (répertoire blame/) : un fichier JSON par chemin suivi, indexé par
+    commit. Seuls les commits qui modifient le fichier et ceux qui ont
+    été annotés y figurent ; un blame ultérieur s'arrête sur le premier
+    commit connu et ne traite que l'historique plus récent.
+    """
+
+    def __init__(self, vcs_dir: str):
+        self.directory = os.path.join(vcs_dir, 'blame')
+
+    def _file(self, path: str) -> str:
+        name = hashlib.sha1(path.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, f"{name}.json")
+
+    def load(self, path: str) -> Dict[str, Origins]:
+        """Origines connues pour `path` : {commit: (hash, origines)}.
+        Un fichier illisible est ignoré (ce n'est qu'un cache)."""
+        try:
+            with open(self._file(path), 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if data.get('version') != BLAME_VERSION or data.get('path') != path:
+            return {}
+        return {commit_id: (entry['hash'], decode_runs(entry['runs']))
+                for commit_id, entry in data['commits'].items()}
+
+    def save(self, path: str, entries: Dict[str, Origins]):
+        data = {
+            'version': BLAME_VERSION,
+            'path': path,
+            'commits': {
+                commit_id: {'hash': blob, 'runs': encode_runs(origins)}
+                for commit_id, (blob, origins) in entries.items()
+            },
+        }
+        os.makedirs(self.directory, exist_ok=True)
+        # Simple cache : pas de verrou, le dernier écrivain gagne
+        atomic_write(self._file(path), json.dumps(data).encode('utf-8'),
+                     fsync=False)
+
+    def clear(self):
+        """Oublie toutes les origines (commits supprimés par gc)."""
+        shutil.rmtree(self.directory, ignore_errors=True)
@@ -1,7 +1,11 @@
 # branches.py
-import json
 import os
+from typing import Dict, List, Optional
+
 from core import VersionControl
+from diff import merge3
+from fsutil import RepoLock, locked
+from metrics import count
 
 
 class BranchManager:
@@ -13,19 +17,60 @@ class BranchManager:
 
     def __init__(self, vcs: VersionControl):
         self.vcs = vcs
-        self.refs_path = os.path.join(self.vcs.vcs_dir, 'refs.json')
+        self.refs_path = self.vcs.refs_file
 
     def _load_refs(self) -> dict:
-        if os.path.exists(self.refs_path):
-            with open(self.refs_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        return {}
+        # Relu depuis le disque seulement si refs.json a changé
+        return self.vcs._load_json(self.refs_path)
 
     def _save_refs(self, refs: dict):
+        # Remplacement atomique : jamais de refs.json tronqué
         os.makedirs(self.vcs.vcs_dir, exist_ok=True)
-        with open(self.refs_path, 'w', encoding='utf-8') as f:
-            json.dump(refs, f, indent=2)
-
+        self.vcs._save_json(self.refs_path, refs)
+        count('refs_saved')
+        # Bitmaps d'accessibilité suivis au fil des déplacements : seuls
+        # les nouveaux commits de la branche sont parcourus
+        self.vcs._tip_positions()
+
+    def merged_branches(self, target: Optional[str] = None
+                        ) -> Dict[str, bool]:
+        """
+        Pour chaque branche, vrai si sa tête est accessible depuis
+        `target` (branche courante par défaut), c'est-à-dire déjà
+        fusionnée : un test de bit par branche. Une branche vide est
+        considérée comme fusionnée.
+        """
+        refs = self._load_refs()
+        target = target or self.vcs._get_head()
+        if target not in refs:
+            raise ValueError(f"Branche '{target}' inexistante")
+        tips = self.vcs._tip_positions()
+        target_pos = tips.get(target)
+        merged = {}
+        for name, commit_id in refs.items():
+            if not commit_id:
+                merged[name] = True
+            elif target_pos is None or name not in tips:
+                merged[name] = False
+            else:
+                merged[name] = self.vcs.bitmaps.reaches(target_pos,
+                                                        tips[name])
+        return merged
+
+    def lock(self) -> RepoLock:
+        """Verrou d'écriture du dépôt (partagé avec VersionControl)."""
+        return self.vcs.lock()
+
+    def _check_no_pending_merge(self):
+        """Un merge en conflit doit être terminé (commit) ou annulé
+        (merge --abort) : sinon le prochain commit, sur n'importe
+        quelle branche, aurait la source du merge pour second parent."""
+        config = self.vcs._load_json(self.vcs.config_file)
+        if config.get('merge_head'):
+            raise ValueError("Merge en cours : terminez-le (commit) ou "
+                             "annulez-le (merge --abort).")
+
+    @locked
     def update_current_branch_commit(self, commit_id: str):
         """Appelé après un commit pour faire avancer la branche
         courante."""
@@ -36,6 +81,7 @@ class BranchManager:
         msg = f"🌲 Branche '{current_branch}' pointe maintenant vers "
         print(msg + f"{commit_id[:7]}")
 
+    @locked
     def create_branch(self, name: str):
         """Crée une nouvelle branche pointant vers le commit
         courant."""
@@ -58,33 +104,62 @@ class BranchManager:
         msg = f"✅ Branche '{name}' créée à partir de "
         print(msg + f"{current_head_branch} ({current_commit_id[:7]})")
 
-    def switch_branch(self, name: str):
+    @locked
+    def switch_branch(self, name: str, jobs: Optional[int] = None):
         """Change de branche et met à jour les fichiers de
-        travail."""
+        travail (`jobs` : nombre d'écritures parallèles)."""
         refs = self._load_refs()
         if name not in refs:
             raise ValueError(f"Branche '{name}' inexistante")
+        self._check_no_pending_merge()
 
         target_commit_id = refs[name]
+        current_commit_id = refs.get(self.vcs._get_head())
 
-        # 1. Mettre à jour HEAD dans config
-        self.vcs._update_head_ref(name)
+        # 1. Restaurer les fichiers (Checkout)
+        # Seules les différences avec le commit quitté sont écrites ; un
+        # refus (modifications indexées) laisse HEAD inchangé
+        self.vcs.checkout_snapshot(target_commit_id, current_commit_id,
+                                   jobs)
 
-        # 2. Restaurer les fichiers (Checkout)
-        # C'est l'étape cruciale pour voir les fichiers changer !
-        self.vcs.checkout_snapshot(target_commit_id)
+        # 2. Mettre à jour HEAD dans config
+        self.vcs._update_head_ref(name)
 
         print(f"✅ Switch vers branche '{name}'")
         return name
 
-    def merge_branch(self, source_branch: str):
+    @locked
+    def abort_merge(self):
+        """Annule un merge en conflit : le répertoire de travail et
+        l'index reviennent au commit courant."""
+        config = self.vcs._load_json(self.vcs.config_file)
+        if not config.pop('merge_head', None):
+            raise ValueError("Aucun merge en cours.")
+        head_commit = self.vcs._load_commit(self.vcs._get_head_commit())
+        head_files = (head_commit or {}).get('files', {})
+        # État réel du disque (marqueurs de conflit compris) : tout ce
+        # qui diffère de HEAD est réécrit
+        worktree = self.vcs._worktree_tree(self.vcs._load_index())
+        written, _ = self.vcs._apply_tree_changes(worktree, head_files)
+        self.vcs._update_index(head_files, written)
+        self.vcs._save_json(self.vcs.config_file, config)
+        print(f"↩️  Merge annulé ({len(written)} fichier(s) restauré(s)).")
+
+    @locked
+    def merge_branch(self, source_branch: str,
+                     interactive: bool = True) -> List[str]:
         """
         Fusionne la branche source dans la branche courante avec
         gestion de conflits.
+        En mode non interactif, les chevauchements sont laissés dans les
+        fichiers sous forme de marqueurs de conflit, sans aucune question.
+        Renvoie les fichiers restés en conflit (vide si le merge est
+        complet).
         """
         refs = self._load_refs()
         if source_branch not in refs:
             raise ValueError(f"Branche source '{source_branch}' inexistante")
+        self._check_no_pending_merge()
 
         current_branch = self.vcs._get_head()
         source_commit_id = refs[source_branch]
@@ -93,101 +168,244 @@ class BranchManager:
         # Cas 1 : À jour
         if source_commit_id == current_commit_id:
             print("Already up to date.")
-            return
+            return []
+
+        # Bitmaps d'accessibilité des deux têtes : deux tests de bit
+        # reconnaissent les cas 2 et 3 ; l'ancêtre commun (commit-graph
+        # + numéros de génération) n'est cherché que pour des
+        # historiques divergents
+        tips = self.vcs._tip_positions()
+        source_pos = tips.get(source_branch)
+        current_pos = tips.get(current_branch)
+        if not current_commit_id:
+            up_to_date, fast_forward = False, True
+        elif source_pos is not None and current_pos is not None:
+            bitmaps = self.vcs.bitmaps
+            up_to_date = bitmaps.reaches(current_pos, source_pos)
+            fast_forward = bitmaps.reaches(source_pos, current_pos)
+        else:
+            # Tête absente du commit-graph : seul l'ancêtre commun tranche
+            up_to_date = fast_forward = None
+
+        base_commit_id = None
+        if current_commit_id and not (up_to_date or fast_forward):
+            base_commit_id = self.vcs.merge_base(
+                current_commit_id, source_commit_id
+            )
+            if up_to_date is None:
+                up_to_date = base_commit_id == source_commit_id
+                fast_forward = base_commit_id == current_commit_id
+
+        # Cas 2 : la source est déjà contenue dans la branche courante
+        if up_to_date:
+            print("Already up to date.")
+            return []
 
-        # Chargement des données des deux commits
-        # Note: On suppose ici que les commits existent.
-        # Gestion d'erreur simplifiée.
-        src_path = os.path.join(
-            self.vcs.commits_dir, f"{source_commit_id}.json"
-        )
-        curr_path = os.path.join(
-            self.vcs.commits_dir, f"{current_commit_id}.json"
-        )
-        src_commit = self.vcs._load_json(src_path)
-        curr_commit = self.vcs._load_json(curr_path)
+        # Cas 3 : Fast-forward, on déplace simplement la référence
+        if fast_forward:
+            print(f"🔀 Fast-forward : {source_branch} -> {current_branch}")
+            self.vcs.checkout_snapshot(source_commit_id, current_commit_id)
+            refs[current_branch] = source_commit_id
+            self._save_refs(refs)
+            msg = f"🚀 Branche '{current_branch}' avancée vers "
+            print(msg + f"{source_commit_id[:7]}.")
+            return []
+
+        # Cas 4 : historiques divergents, fusion à trois voies
+        src_commit = self.vcs._load_commit(source_commit_id) or {}
+        curr_commit = self.vcs._load_commit(current_commit_id) or {}
+        base_commit = self.vcs._load_commit(base_commit_id) or {}
 
         src_files = src_commit.get('files', {})
         curr_files = curr_commit.get('files', {})
+        base_files = base_commit.get('files', {})
 
         print(f"🔀 Début du merge : {source_branch} -> {current_branch}")
 
         # Détection des conflits et préparation du nouvel état des fichiers
         final_files_state = curr_files.copy()
         conflict_detected = False
-
-        # On parcourt les fichiers de la branche source
-        for filename, data in src_files.items():
-            # Si le fichier existe dans la branche courante
-            if filename in curr_files:
-                # Si le hash est différent, il y a un changement de contenu
-                if data['hash'] != curr_files[filename]['hash']:
-                    print(f"⚔️  CONFLIT DÉTECTÉ sur : {filename}")
-                    conflict_detected = True
+        unresolved = []
+
+        for filename in sorted(set(src_files) | set(curr_files)):
+            base_hash = base_files.get(filename, {}).get('hash')
+            curr_hash = curr_files.get(filename, {}).get('hash')
+            src_hash = src_files.get(filename, {}).get('hash')
+
+            # Même contenu des deux côtés, ou seule la branche courante
+            # a modifié le fichier : rien à faire
+            if src_hash == curr_hash or src_hash == base_hash:
+                continue
+
+            # Seule la source a modifié (ou ajouté/supprimé) le fichier
+            if curr_hash == base_hash:
+                if src_hash is None:
+                    print(f"🗑  Fichier supprimé par le merge : {filename}")
+                    del final_files_state[filename]
+                else:
+                    if curr_hash is None:
+                        msg = "📄 Nouveau fichier ajouté par le merge : "
+                        print(msg + filename)
+                    final_files_state[filename] = src_files[filename]
+                continue
+
+            # Supprimé d'un côté, modifié de l'autre : on garde la
+            # version modifiée
+            if src_hash is None or curr_hash is None:
+                print(f"⚠  {filename} supprimé d'un côté et modifié de "
+                      "l'autre : version modifiée conservée.")
+                if curr_hash is None:
+                    final_files_state[filename] = src_files[filename]
+                continue
+
+            # Les deux branches ont modifié le fichier : fusion ligne à
+            # ligne par rapport à l'ancêtre commun
+            try:
+                base_content = (
+                    self.vcs._blob_content(base_files[filename])
+                    if base_hash else ''
+                )
+                count('files_merged')
+                merged_lines, overlaps = merge3(
+                    base_content.splitlines(keepends=True),
+                    self.vcs._blob_content(
+                        curr_files[filename]
+                    ).splitlines(keepends=True),
+                    self.vcs._blob_content(
+                        src_files[filename]
+                    ).splitlines(keepends=True),
+                    current_branch, source_branch
+                )
+                merged_content = ''.join(merged_lines)
+            except UnicodeDecodeError:
+                # Fichier binaire : pas de fusion ligne à ligne possible
+                merged_content = None
+                overlaps = 1
+
+            if not overlaps:
+                print(f"🧩 Fusion automatique des lignes : {filename}")
+                resolved_content = merged_content
+            else:
+                print(f"⚔️  CONFLIT DÉTECTÉ sur : {filename}")
+                conflict_detected = True
+                if interactive:
                     # Appel au résolveur interactif
                     resolved_content = self.resolve_conflict(
-                        filename, curr_files[filename], data
+                        filename, curr_files[filename], src_files[filename]
                     )
-
-                    # Mise à jour avec le contenu résolu
+                elif merged_content is None:
+                    # Binaire : la version locale reste sur le disque
+                    unresolved.append(filename)
+                    continue
+                else:
+                    # Marqueurs laissés dans le fichier, sans objet :
+                    # `add` le hachera une fois le conflit résolu
                     final_files_state[filename] = {
-                        'content': resolved_content,
-                        'hash': self.vcs._compute_hash(
-                            resolved_content
-                        )  # Recalcul du hash
+                        'hash': self.vcs._compute_hash(merged_content),
+                        'content': merged_content,
                     }
-            else:
-                # Si le fichier est nouveau dans la source,
-                # on l'ajoute simplement
-                msg = "📄 Nouveau fichier ajouté par le merge : "
-                print(msg + filename)
-                final_files_state[filename] = data
-
-        if conflict_detected:
+                    unresolved.append(filename)
+                    continue
+
+            # Le contenu résolu rejoint objects/, le snapshot
+            # ne garde que son hash
+            final_files_state[filename] = {
+                'hash': self.vcs._write_object(resolved_content)
+            }
+
+        # Entrées d'anciens commits (contenu en ligne) : écrites dans
+        # objects/, le commit de fusion et l'index n'en gardent que le
+        # hash
+        final_files_state = {
+            name: (data if name in unresolved
+                   else self.vcs._stored_entry(data))
+            for name, data in final_files_state.items()
+        }
+
+        # Modifications indexées hors du merge : gardées dans l'index
+        # (refus avant toute écriture si le merge les écraserait)
+        staged = self.vcs._carry_staged(curr_files, final_files_state)
+        # Idem pour les fichiers modifiés sur le disque et non indexés
+        self.vcs._check_worktree(curr_files, final_files_state)
+
+        if unresolved:
+            print(f"\n⚠  {len(unresolved)} fichier(s) en conflit "
+                  "(marqueurs <<<<<<< / >>>>>>> écrits ; version locale "
+                  "conservée pour les binaires).")
+        elif conflict_detected:
             print("\n✅ Tous les conflits ont été résolus.")
         else:
-            print("✨ Fusion automatique réussie (Fast-Forward/Auto-merge).")
+            print("✨ Fusion automatique réussie (Auto-merge).")
 
         # APPLICATION DU MERGE SUR LE DISQUE
-        # Dans un vrai Git, le merge modifie le Working Directory et l'Index,
-        # puis demande un commit. Nous allons simuler cela.
-
+        # Seuls les fichiers modifiés par le merge sont réécrits
         print("💾 Écriture des fichiers fusionnés sur le disque...")
-        for filename, data in final_files_state.items():
-            full_path = os.path.join(self.vcs.repo_path, filename)
-            with open(full_path, 'w', encoding='utf-8') as f:
-                f.write(data['content'])
-
-        # Mise à jour de la référence (HEAD avance)
-        # Note pédagogique : Normalement, un merge crée un NOUVEAU
-        # commit de fusion. Ici, pour simplifier, on déplace le
-        # pointeur sur le commit source SI pas de conflit, sinon on
-        # laisse l'utilisateur faire un nouveau commit.
+        written, _ = self.vcs._apply_tree_changes(
+            curr_files, final_files_state
+        )
 
         if not conflict_detected:
-            # Fast-forward simple
-            refs[current_branch] = source_commit_id
+            # Commit de fusion à deux parents
+            merge_msg = f"Merge branch '{source_branch}' "
+            merge_msg += f"into {current_branch}"
+            merge_commit_id = self.vcs._write_commit(
+                merge_msg, final_files_state,
+                [current_commit_id, source_commit_id]
+            )
+            self.vcs._update_index(final_files_state, written, staged)
+            refs[current_branch] = merge_commit_id
             self._save_refs(refs)
-            msg = f"🚀 Branche '{current_branch}' avancée vers "
-            print(msg + f"{source_commit_id[:7]}.")
+            msg = f"🚀 Commit de fusion {merge_commit_id[:7]} créé sur "
+            print(msg + f"'{current_branch}'.")
         else:
-            print("⚠  Le système de fichiers a été mis à jour avec")
-            print("les résolutions.")
-            print("👉 Veuillez maintenant faire : add . puis commit")
-            print("'Merge result' pour finaliser.")
+            # Le résultat est placé dans l'index (sauf les fichiers encore
+            # en conflit) ; le prochain commit aura la source comme
+            # second parent
+            staged_tree = dict(final_files_state)
+            for filename in unresolved:
+                staged_tree[filename] = self.vcs._stored_entry(
+                    curr_files[filename]
+                )
+            self.vcs._update_index(
+                staged_tree, [f for f in written if f not in unresolved],
+                staged
+            )
+            config = self.vcs._load_json(self.vcs.config_file)
+            config['merge_head'] = source_commit_id
+            self.vcs._save_json(self.vcs.config_file, config)
+            if unresolved:
+                for filename in unresolved:
+                    print(f"  ✗ {filename}")
+                print("👉 Corrigez ces fichiers, puis : add <fichiers>")
+                print("puis commit 'Merge result' pour finaliser.")
+            else:
+                print("⚠  Le système de fichiers a été mis à jour avec")
+                print("les résolutions.")
+                print("👉 Veuillez maintenant faire : commit")
+                print("'Merge result' pour finaliser.")
+        return unresolved
 
     def resolve_conflict(self, filename: str, local_data: dict,
-                         remote_data: dict) -> str:
+                         remote_data: dict) -> bytes:
         """
         Outil interactif de résolution de conflits.
-        Retourne le contenu final choisi par l'utilisateur.
+        Retourne le contenu final (octets) choisi par l'utilisateur.
         """
-        content_local = local_data['content']
-        content_remote = remote_data['content']
+        content_local = self.vcs._blob_bytes(local_data)
+        content_remote = self.vcs._blob_bytes(remote_data)
 
         print(f"\n--- Résolution pour '{filename}' ---")
-        print(f"🔵 LOCAL (Branche courante) :\n{content_local}")
-        print(f"🟠 REMOTE (Branche entrante) :\n{content_remote}")
+        hunks = self.vcs.diff_hunks(local_data, remote_data)
+        if hunks is None:
+            print("🔵 LOCAL (Branche courante) :\n"
+                  + self._printable(content_local))
+            print("🟠 REMOTE (Branche entrante) :\n"
+                  + self._printable(content_remote))
+        else:
+            # Seules les lignes qui diffèrent, pas les deux fichiers
+            print("--- 🔵 LOCAL (Branche courante)")
+            print("+++ 🟠 REMOTE (Branche entrante)")
+            print(''.join(hunks), end='')
         print("-----------------------------------")
 
         while True:
@@ -210,7 +428,15 @@ class BranchManager:
                 # à ligne ou concaténé. Si vous voulez gérer
                 # plusieurs lignes, c'est plus complexe en
                 # `input()` simple
-                return new_content + "\n"
+                return (new_content + "\n").encode('utf-8')
 
             else:
                 print("❌ Choix invalide. Réessayez.")
+
+    @staticmethod
+    def _printable(content: bytes) -> str:
+        """Texte affichable d'un contenu (résumé pour un binaire)."""
+        try:
+            return content.decode('utf-8')
+        except UnicodeDecodeError:
+            return f"<fichier binaire, {len(content)} octets>"
@@ -0,0 +1,55 @@
+# colors.py
+import sys
+
+# Couleurs actives (désactivées en mode commande si la sortie n'est pas
+# un terminal)
+_enabled = True
+# Module colorama une fois chargé (None : pas encore importé)
+_colorama = None
+
+
+def set_enabled(enabled: bool):
+    global _enabled
+    _enabled = enabled
+
+
+def enable_for(stream=sys.stdout):
+    """Active les couleurs seulement si `stream` est un terminal."""
+    set_enabled(hasattr(stream, 'isatty') and stream.isatty())
+
+
+def _load():
+    """Importe colorama à la première couleur demandée."""
+    global _colorama
+    if _colorama is None:
+        try:
+            import colorama
+            # Important pour Windows
+            colorama.init(autoreset=False)
+            _colorama = colorama
+        except ImportError:
+            _colorama = False
+    return _colorama
+
+
+class _Palette:
+    """
+    Équivalent paresseux de colorama.Fore / colorama.Style : le module
+    n'est importé qu'au premier code demandé, jamais si les couleurs
+    sont désactivées ou si colorama est absent (chaîne vide).
+    """
+
+    def __init__(self, name: str):
+        self._name = name
+
+    def __getattr__(self, attr: str) -> str:
+        if attr.startswith('_') or not _enabled:
+            return ''
+        colorama = _load()
+        if not colorama:
+            return ''
+        return getattr(getattr(colorama, self._name), attr)
+
+
+Fore = _Palette('Fore')
+Style = _Palette('Style')
@@ -0,0 +1,632 @@
+# commands.py
+import os
+import json
+import time
+from datetime import datetime
+from itertools import islice
+from typing import Optional
+
+import metrics
+from colors import Fore, Style
+from core import Repository, VersionControl
+from branches import BranchManager
+from graphview import LaneRenderer, refs_by_commit
+
+
+class VCSCommands:
+    """
+    Commandes du VCS (méthodes do_*), indépendantes de cmd.Cmd.
+    Utilisées par le shell interactif (EnhancedCLI) et par le mode
+    commande unique de main.py (`python main.py status`).
+    """
+
+    def __init__(self, repository: Optional[Repository] = None):
+        # Session conservée entre les commandes : config, refs et
+        # commits restent en cache
+        self.repo = repository if repository is not None else Repository()
+        self.vcs = VersionControl(repository=self.repo)
+        self.bm = BranchManager(self.vcs)
+        # Passe à 1 dès qu'une commande échoue (code de sortie)
+        self.exit_code = 0
+        # Mesures de la dernière commande et cumul de la session (stats)
+        self.last_stats: Optional[dict] = None
+        self.session_stats = {'commands': 0, 'seconds': 0.0}
+        self._session_start = metrics.snapshot()
+        self._measure = None
+
+    def update_prompt(self):
+        """Appelé après un changement de branche (rien hors du shell)."""
+
+    def _begin_command(self, line: str):
+        """Début de mesure d'une commande (durée et compteurs)."""
+        name = line.split()[0] if line.split() else ''
+        self._measure = (name, time.perf_counter(), metrics.snapshot())
+
+    def _end_command(self) -> Optional[dict]:
+        """Fin de mesure : renvoie les mesures de la commande. `stats`
+        n'écrase pas celles de la commande qu'il affiche."""
+        if self._measure is None:
+            return None
+        name, start, before = self._measure
+        self._measure = None
+        if not name or name == 'stats':
+            return None
+        elapsed = time.perf_counter() - start
+        self.last_stats = {'command': name, 'seconds': elapsed,
+                           'counters': metrics.delta(before)}
+        self.session_stats['commands'] += 1
+        self.session_stats['seconds'] += elapsed
+        return self.last_stats
+
+    def _error(self, text: str):
+        """Affiche une erreur et la mémorise pour le code de sortie."""
+        self.exit_code = 1
+        print(f"{Fore.RED}{text}{Style.RESET_ALL}")
+
+    def do_help(self, _arg):
+        """Affiche le guide visuel des commandes et le flux de travail."""
+        hline = (
+            f"\n{Fore.CYAN}╔═════════════════════════════════════════════════════════╗"
+        )
+        print(hline)
+        title = (
+            "║ SCEMA DU FLUX DE TRAVAIL (VCS WORKFLOW)                      ║"
+        )
+        print(title)
+        bline = (
+            f"╚══════════════════════════════════════════════════════════════╝"
+            f"{Style.RESET_ALL}"
+        )
+        print(bline)
+
+        workflow = """
+        [ Répertoire de Travail ] ----> ( add ) ----> [ Zone de Staging ]
+               (Fichiers réels)                         (index binaire)
+                                                              |
+                                                              v
+        [ Graph de Commits (DAG) ] <--- ( commit ) <-----------+
+              (Dépôt /commits)
+        """
+        print(workflow)
+
+        print(f"{Fore.YELLOW}COMMANDES DISPONIBLES :{Style.RESET_ALL}")
+        table_data = [
+            ["init", "Initialise le dépôt et crée la structure .mini_vcs"],
+            [
+                "add <fich>",
+                "Prépare un fichier pour le prochain snapshot (Staging)",
+            ],
+            [
+                "add -j N <fich>",
+                "Idem, hachage/compression répartis sur N threads",
+            ],
+            [
+                "commit <msg>",
+                "Enregistre définitivement l'état du staging dans le DAG",
+            ],
+            [
+                "status",
+                "Compare le disque, le staging et le dernier commit",
+            ],
+            ["branch list", "Affiche toutes les branches existantes"],
+            [
+                "  --merged [b]",
+                "Branches déjà fusionnées dans b (--no-merged : l'inverse)",
+            ],
+            [
+                "branch create",
+                "Crée un nouveau pointeur (branche) sur le commit actuel",
+            ],
+            [
+                "branch switch",
+                "Déplace HEAD et restaure les fichiers du commit cible",
+            ],
+            [
+                "merge <nom>",
+                "Fusion 3 voies (--no-interactive : marqueurs de conflit)",
+            ],
+            [
+                "merge --abort",
+                "Annule un merge en conflit (retour au commit courant)",
+            ],
+            [
+                "graph [-n N]",
+                "Dessine le DAG des commits en colonnes, avec les branches",
+            ],
+            [
+                "log [-n N]",
+                "Historique depuis HEAD (--since/--until, A..B, -- chemin)",
+            ],
+            [
+                "diff [--cached] [rev]",
+                "Différences (disque, index, commits ou branches)",
+            ],
+            [
+                "blame [rev] <fichier>",
+                "Commit d'origine de chaque ligne (alias : annotate)",
+            ],
+            [
+                "repack",
+                "Regroupe commits et objets dans un packfile compressé",
+            ],
+            [
+                "stats [--json]",
+                "Durée et compteurs d'E/S de la dernière commande",
+            ],
+            [
+                "gc",
+                "Supprime commits et objets inaccessibles, puis repack",
+            ],
+            [
+                "fsck [-j N]",
+                "Vérifie le hash de chaque objet (N processus)",
+            ],
+        ]
+
+        for command, desc in table_data:
+            print(
+                f"  {Fore.GREEN}{command:<15}{Style.RESET_ALL} : {desc}"
+            )
+        print("\n")
+
+    def do_graph(self, arg):
+        """Visualise le DAG en colonnes : graph [-n N]"""
+        args = arg.split()
+        limit = None
+        try:
+            if args:
+                option, _, value = args[0].partition('=')
+                if option.startswith('-n') and option[2:].isdigit():
+                    option, value = '-n', option[2:]
+                if option not in ('-n', '--max-count') or len(args) > 2:
+                    raise ValueError(option)
+                limit = int(value or args[1])
+        except (IndexError, ValueError):
+            print("Usage: graph [-n N]")
+            return
+
+        if not os.path.exists(self.vcs.vcs_dir):
+            print("Le graph est vide.")
+            return
+
+        msg = f"\n{Fore.MAGENTA}--- REPRÉSENTATION DU GRAPH (DAG) ---"
+        print(f"{msg}{Style.RESET_ALL}")
+
+        # Lecture du seul commit-graph : les objets commit ne sont
+        # jamais ouverts
+        self.vcs._ensure_commit_graph()
+        graph = self.vcs.graph
+        refs = self.bm._load_refs()
+        head_branch = self.vcs._get_head()
+        # Décorations : une seule passe sur les refs, puis une recherche
+        # par commit affiché
+        tips = refs_by_commit(refs)
+        include = list(graph.positions(tips).values())
+        renderer = LaneRenderer()
+
+        # Parcours depuis toutes les branches, enfants avant parents ;
+        # chaque commit est dessiné dès qu'il est dépilé
+        walk = graph.walk(include, topo=True)
+        for info in islice(walk, limit):
+            parents = [graph.record(p).id for p in info.parents]
+            before, row, after = renderer.add(info.id, parents)
+            for line in before:
+                print(line)
+
+            decorations = []
+            for name in tips.get(info.id, ()):
+                if name == head_branch:
+                    decorations.insert(
+                        0, f"{Fore.CYAN}HEAD -> {name}{Style.RESET_ALL}"
+                    )
+                else:
+                    decorations.append(
+                        f"{Fore.GREEN}{name}{Style.RESET_ALL}"
+                    )
+            suffix = f" ({', '.join(decorations)})" if decorations else ""
+            print(f"{row} {Fore.YELLOW}{info.id[:7]}{Style.RESET_ALL}"
+                  f"{suffix} {graph.message(info)}")
+            for line in after:
+                print(line)
+
+    def do_init(self, arg):
+        """Initialiser un nouveau dépôt VCS dans le dossier courant."""
+        self.vcs.init_repo()
+
+    def do_add(self, _arg):
+        """Ajouter des fichiers au staging : add [-j N] <file1> [file2]..."""
+        args = _arg.split()
+        jobs = 1
+        files = []
+        i = 0
+        try:
+            while i < len(args):
+                if args[i] in ('-j', '--jobs'):
+                    jobs = int(args[i + 1])
+                    i += 1
+                elif args[i].startswith('--jobs='):
+                    jobs = int(args[i].split('=', 1)[1])
+                else:
+                    files.append(args[i])
+                i += 1
+        except (IndexError, ValueError):
+            files = []
+        if not files or jobs < 1:
+            usage = "Usage: add [-j N] file1 file2 ..."
+            print(f"{Fore.YELLOW}{usage}{Style.RESET_ALL}")
+            return
+        try:
+            self.vcs.add(files, jobs=jobs)
+        except Exception as e:
+            self._error(f"Erreur: {e}")
+
+    def do_commit(self, arg):
+        """Enregistrer modifications : commit "Message du commit" """
+        if not arg:
+            usage = (
+                f'{Fore.YELLOW}Usage: commit "Mon message"'
+                f'{Style.RESET_ALL}'
+            )
+            print(usage)
+            return
+
+        msg = arg.strip('"\'')
+        try:
+            # Verrou tenu du commit jusqu'à la mise à jour de la branche :
+            # deux commits concurrents ne peuvent pas partir du même parent
+            with self.vcs.lock():
+                # 1. Créer le commit (Blob)
+                commit_id = self.vcs.commit(msg)
+
+                # 2. Mettre à jour branche courante pour pointer
+                if commit_id:
+                    self.bm.update_current_branch_commit(commit_id)
+            if commit_id:
+                success = (
+                    f"{Fore.GREEN}Commit {commit_id[:7]} "
+                    "enregistré avec succès."
+                    f"{Style.RESET_ALL}"
+                )
+                print(success)
+        except Exception as e:
+            self._error(f"Erreur lors du commit: {e}")
+
+    def do_status(self, _arg):
+        """Afficher état du dépôt (fichiers, staging, branche)."""
+        try:
+            data = self.vcs.get_status_data()
+            head = data['head']
+
+            print(f"\n{Fore.CYAN}--- STATUS ---{Style.RESET_ALL}")
+            print(
+                f"Branche courante : "
+                f"{Fore.MAGENTA}{head}{Style.RESET_ALL}"
+            )
+
+            if data['staged'] or data['removed']:
+                staged_msg = (
+                    f"\n{Fore.GREEN}Fichiers dans le staging "
+                    f"(prêts à commit) :{Style.RESET_ALL}"
+                )
+                print(staged_msg)
+                for f in data['staged']:
+                    print(f"  + {f}")
+                for f in data['removed']:
+                    print(f"  - {f}")
+            else:
+                print(f"\n{Fore.YELLOW}Staging vide.{Style.RESET_ALL}")
+
+            if data['modified'] or data['deleted']:
+                changed_msg = (
+                    f"\n{Fore.YELLOW}Modifications non indexées :"
+                    f"{Style.RESET_ALL}"
+                )
+                print(changed_msg)
+                for f in data['modified']:
+                    print(f"  ~ {f}")
+                for f in data['deleted']:
+                    print(f"  ✗ {f} (supprimé)")
+
+            if data['untracked']:
+                untrack_msg = (
+                    f"\n{Fore.RED}Fichiers non suivis (Untracked) :"
+                    f"{Style.RESET_ALL}"
+                )
+                print(untrack_msg)
+                for f in data['untracked']:
+                    print(f"  ? {f}")
+            print()
+
+        except Exception as e:
+            self._error(f"Erreur status (avez-vous fait 'init' ?) : {e}")
+
+    def do_branch(self, arg):
+        """Commandes: branch list [--merged|--no-merged] | create <nom> |
+        switch <nom> [-j N]"""
+        args = arg.split()
+        if not args:
+            self.do_help('branch')
+            return
+
+        branch_cmd = args[0]
+        try:
+            if branch_cmd == 'create' and len(args) > 1:
+                self.bm.create_branch(args[1])
+            elif branch_cmd == 'switch' and len(args) > 1:
+                jobs = None
+                if len(args) > 3 and args[2] in ('-j', '--jobs'):
+                    jobs = int(args[3])
+                self.bm.switch_branch(args[1], jobs=jobs)
+                self.update_prompt()
+            elif branch_cmd == 'list':
+                refs = self.bm._load_refs()
+                curr = self.vcs._get_head()
+                # --merged / --no-merged [branche] : filtrage par les
+                # bitmaps d'accessibilité
+                if len(args) > 1:
+                    if (args[1] not in ('--merged', '--no-merged')
+                            or len(args) > 3):
+                        print("Usage: branch list [--merged|--no-merged] "
+                              "[branche]")
+                        return
+                    merged = self.bm.merged_branches(
+                        args[2] if len(args) > 2 else None
+                    )
+                    wanted = args[1] == '--merged'
+                    refs = {b: cid for b, cid in refs.items()
+                            if merged[b] == wanted}
+                print(f"\n{Fore.CYAN}Branches :{Style.RESET_ALL}")
+                for b, cid in refs.items():
+                    prefix = "*" if b == curr else " "
+                    cid_str = cid[:7] if cid else 'Empty'
+                    print(f" {prefix} {b} \t({cid_str})")
+                print()
+            else:
+                print("Usage: branch [create|switch|list] <args>")
+                print("       branch switch <nom> [-j N]")
+                print("       branch list [--merged|--no-merged] [nom]")
+        except Exception as e:
+            self._error(f"Erreur branche: {e}")
+
+    def do_merge(self, _arg):
+        """Fusionner une branche : merge <nom_branche> [--no-interactive]
+        ou annuler un merge en conflit : merge --abort"""
+        args = _arg.split()
+        interactive = '--no-interactive' not in args
+        args = [a for a in args if a != '--no-interactive']
+        if args == ['--abort']:
+            try:
+                self.bm.abort_merge()
+            except Exception as e:
+                self._error(f"Erreur merge: {e}")
+            return
+        if len(args) != 1:
+            print("Usage: merge <nom_branche> [--no-interactive]")
+            print("       merge --abort")
+            return
+        try:
+            unresolved = self.bm.merge_branch(args[0],
+                                              interactive=interactive)
+        except Exception as e:
+            self._error(f"Erreur merge: {e}")
+            return
+        if unresolved:
+            # Merge inachevé : détectable par un script (code de sortie)
+            self.exit_code = 1
+
+    def do_log(self, arg):
+        """Historique : log [-n N] [--since D] [--until D] [rev|A..B]
+        [-- chemin...]"""
+        usage = ("Usage: log [-n N] [--since AAAA-MM-JJ] "
+                 "[--until AAAA-MM-JJ] [branche|A..B] [-- chemin...]")
+        args = arg.split()
+        limit = None
+        dates = {'--since': None, '--until': None}
+        revs, paths = [], []
+        i = 0
+        try:
+            while i < len(args):
+                option, _, value = args[i].partition('=')
+                if option.startswith('-n') and option[2:].isdigit():
+                    # Forme collée : -n10
+                    option, value = '-n', option[2:]
+                if args[i] == '--':
+                    paths = args[i + 1:]
+                    break
+                elif option in ('-n', '--max-count'):
+                    if not value:
+                        i += 1
+                        value = args[i]
+                    limit = int(value)
+                elif option in dates:
+                    if not value:
+                        i += 1
+                        value = args[i]
+                    dates[option] = datetime.fromisoformat(value)
+                else:
+                    revs.append(args[i])
+                i += 1
+        except (IndexError, ValueError):
+            print(usage)
+            return
+
+        # Lecture du seul commit-graph (id, date, message), à partir de
+        # HEAD et au fil du parcours : rien n'est chargé d'avance
+        if not os.path.exists(self.vcs.vcs_dir):
+            print("Aucun historique.")
+            return
+
+        graph = self.vcs.graph
+        print(f"\n{Fore.CYAN}--- HISTORIQUE ---{Style.RESET_ALL}")
+        try:
+            history = self.vcs.log(revs, since=dates['--since'],
+                                   until=dates['--until'], paths=paths)
+            for info in islice(history, limit):
+                commit_line = (
+                    f"{Fore.YELLOW}{info.id[:7]}"
+                    f"{Style.RESET_ALL} - {info.date.isoformat()} : "
+                    f"{graph.message(info)}"
+                )
+                print(commit_line)
+        except ValueError as e:
+            self._error(f"Erreur log: {e}")
+        print()
+
+    def do_diff(self, arg):
+        """Différences : diff [--cached] [-U N] [rev [rev]|A..B]
+        [-- chemin...]"""
+        usage = ("Usage: diff [--cached] [-U N] [rev [rev]|A..B] "
+                 "[-- chemin...]")
+        args = arg.split()
+        cached = False
+        context = 3
+        revs, paths = [], []
+        i = 0
+        try:
+            while i < len(args):
+                option, _, value = args[i].partition('=')
+                if option.startswith('-U') and option[2:].isdigit():
+                    # Forme collée : -U5
+                    option, value = '-U', option[2:]
+                if args[i] == '--':
+                    paths = args[i + 1:]
+                    break
+                elif option in ('--cached', '--staged'):
+                    cached = True
+                elif option in ('-U', '--unified'):
+                    if not value:
+                        i += 1
+                        value = args[i]
+                    context = int(value)
+                    if context < 0:
+                        raise ValueError(context)
+                elif option.startswith('-'):
+                    raise ValueError(option)
+                else:
+                    revs.append(args[i])
+                i += 1
+        except (IndexError, ValueError):
+            print(usage)
+            return
+
+        if not os.path.exists(self.vcs.vcs_dir):
+            print("Dépôt non initialisé.")
+            return
+        colors = {'@': Fore.CYAN, '-': Fore.RED, '+': Fore.GREEN}
+        try:
+            # Fichier par fichier : la sortie commence avant la fin
+            for name, before, after in self.vcs.diff(revs, cached, paths):
+                old = f"a/{name}" if before else '/dev/null'
+                new = f"b/{name}" if after else '/dev/null'
+                print(f"{Fore.YELLOW}diff a/{name} b/{name}"
+                      f"{Style.RESET_ALL}")
+                hunks = self.vcs.diff_hunks(before, after, context)
+                if hunks is None:
+                    print(f"Fichiers binaires {old} et {new} différents")
+                    continue
+                print(f"--- {old}\n+++ {new}")
+                for line in hunks:
+                    color = colors.get(line[0])
+                    text = line.rstrip('\n')
+                    if color:
+                        text = f"{color}{text}{Style.RESET_ALL}"
+                    print(text)
+        except ValueError as e:
+            self._error(f"Erreur diff: {e}")
+
+    def do_blame(self, arg):
+        """Origine de chaque ligne : blame [rev] <fichier>"""
+        args = arg.split()
+        if len(args) not in (1, 2):
+            print("Usage: blame [rev] <fichier>")
+            return
+        rev = args[0] if len(args) == 2 else 'HEAD'
+        if not os.path.exists(self.vcs.vcs_dir):
+            print("Dépôt non initialisé.")
+            return
+        try:
+            annotated = self.vcs.blame(args[-1], rev)
+        except ValueError as e:
+            self._error(f"Erreur blame: {e}")
+            return
+
+        dates = {}
+        width = len(str(len(annotated)))
+        for number, (origin, line) in enumerate(annotated, start=1):
+            if origin not in dates:
+                commit = self.vcs._load_commit(origin) or {}
+                dates[origin] = commit.get('date', '')[:16].replace('T', ' ')
+            print(f"{Fore.YELLOW}{origin[:7]}{Style.RESET_ALL} "
+                  f"({dates[origin]} {number:>{width}}) {line}")
+
+    do_annotate = do_blame
+
+    def do_gc(self, _arg):
+        """Supprimer commits et objets inaccessibles, puis tout packer."""
+        try:
+            self.vcs.gc()
+        except Exception as e:
+            self._error(f"Erreur gc: {e}")
+
+    def do_fsck(self, arg):
+        """Vérifier l'intégrité des objets : fsck [-j N]"""
+        args = arg.split()
+        jobs = None
+        try:
+            if args:
+                if args[0] not in ('-j', '--jobs') or len(args) != 2:
+                    raise ValueError(args[0])
+                jobs = int(args[1])
+                if jobs < 1:
+                    raise ValueError(jobs)
+        except ValueError:
+            print("Usage: fsck [-j N]")
+            return
+        try:
+            problems = self.vcs.fsck(jobs=jobs)
+        except Exception as e:
+            self._error(f"Erreur fsck: {e}")
+            return
+        for problem in problems:
+            print(f"{Fore.RED}✗ {problem}{Style.RESET_ALL}")
+        if problems:
+            self.exit_code = 1
+            print(f"{Fore.RED}{len(problems)} problème(s) détecté(s)."
+                  f"{Style.RESET_ALL}")
+        else:
+            print(f"{Fore.GREEN}✅ Dépôt intègre.{Style.RESET_ALL}")
+
+    def do_stats(self, arg):
+        """Compteurs de la dernière commande et de la session : stats
+        [--json]"""
+        session = dict(self.session_stats,
+                       counters=metrics.delta(self._session_start))
+        if arg.split() == ['--json']:
+            print(json.dumps({'last': self.last_stats, 'session': session},
+                             indent=2))
+            return
+        if arg.strip():
+            print("Usage: stats [--json]")
+            return
+
+        print(f"\n{Fore.CYAN}--- STATISTIQUES ---{Style.RESET_ALL}")
+        blocks = [(f"Session ({session['commands']} commande(s))", session)]
+        if self.last_stats:
+            blocks.insert(0, (f"Dernière commande "
+                              f"({self.last_stats['command']})",
+                              self.last_stats))
+        else:
+            print("Aucune commande mesurée.")
+        for title, data in blocks:
+            print(f"{Fore.YELLOW}{title}{Style.RESET_ALL} : "
+                  f"{data['seconds'] * 1000:.1f} ms")
+            if data['counters']:
+                print(metrics.format_counters(data['counters']))
+        print()
+
+    def do_repack(self, _arg):
+        """Regrouper commits et objets dans un packfile compressé."""
+        try:
+            self.vcs.repack()
+        except Exception as e:
+            self._error(f"Erreur repack: {e}")
@@ -0,0 +1,308 @@
+# commitgraph.py
+import os
+import mmap
+import heapq
+import struct
+from collections import namedtuple
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional
+
+from fsutil import atomic_write, fsync_file
+
+GRAPH_MAGIC = b'MVCG'
+GRAPH_VERSION = 1
+
+HEADER = struct.Struct('>4sI')
+# id (SHA-1 binaire), parents (positions), date (µs), offset du message,
+# numéro de génération
+RECORD = struct.Struct('>20sIIqQI')
+NO_PARENT = 0xFFFFFFFF
+# Longueur d'un message dans le fichier .msgs
+MSG_LEN = struct.Struct('>I')
+
+EPOCH = datetime(1970, 1, 1)
+
+CommitInfo = namedtuple(
+    'CommitInfo',
+    ['position', 'id', 'parents', 'date', 'message_offset', 'generation']
+)
+
+
+class CommitGraph:
+    """
+    Métadonnées compactes de l'historique (fichier commit-graph).
+    Un enregistrement de taille fixe par commit, ajouté à chaque commit :
+    `log` et `graph` n'ont plus besoin d'ouvrir les objets commit.
+    Les parents sont stockés par position, les messages dans un fichier
+    séparé (commit-graph.msgs).
+    """
+
+    def __init__(self, vcs_dir: str):
+        self.path = os.path.join(vcs_dir, 'commit-graph')
+        self.msgs_path = os.path.join(vcs_dir, 'commit-graph.msgs')
+        self._map = None
+        self._msgs = None
+        self._size = -1
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def _mapped(self) -> Optional[mmap.mmap]:
+        """Projection mémoire du fichier, renouvelée s'il a grandi."""
+        try:
+            size = os.path.getsize(self.path)
+        except FileNotFoundError:
+            self.close()
+            return None
+        if size != self._size:
+            self.close()
+            with open(self.path, 'rb') as f:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            with open(self.msgs_path, 'rb') as f:
+                if os.fstat(f.fileno()).st_size:
+                    self._msgs = mmap.mmap(f.fileno(), 0,
+                                           access=mmap.ACCESS_READ)
+            magic, _version = HEADER.unpack_from(self._map, 0)
+            if magic != GRAPH_MAGIC:
+                raise ValueError(f"commit-graph invalide : {self.path}")
+            self._size = size
+        return self._map
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+        if self._msgs is not None:
+            self._msgs.close()
+        self._map = self._msgs = None
+        self._size = -1
+
+    def __len__(self) -> int:
+        mapped = self._mapped()
+        if mapped is None:
+            return 0
+        return (len(mapped) - HEADER.size) // RECORD.size
+
+    def record(self, position: int) -> CommitInfo:
+        raw_id, p1, p2, stamp, msg_off, gen = RECORD.unpack_from(
+            self._mapped(), HEADER.size + position * RECORD.size
+        )
+        parents = [p for p in (p1, p2) if p != NO_PARENT]
+        return CommitInfo(position, raw_id.hex(), parents,
+                          EPOCH + timedelta(microseconds=stamp),
+                          msg_off, gen)
+
+    def records(self) -> Iterator[CommitInfo]:
+        """Parcourt les commits dans l'ordre d'enregistrement."""
+        for position in range(len(self)):
+            yield self.record(position)
+
+    def message(self, info: CommitInfo) -> str:
+        self._mapped()
+        (length,) = MSG_LEN.unpack_from(self._msgs, info.message_offset)
+        start = info.message_offset + MSG_LEN.size
+        return self._msgs[start:start + length].decode('utf-8')
+
+    def position(self, commit_id: str) -> Optional[int]:
+        """Position d'un commit (recherche depuis les plus récents)."""
+        mapped = self._mapped()
+        if mapped is None or not commit_id:
+            return None
+        try:
+            raw = bytes.fromhex(commit_id)
+        except ValueError:
+            return None
+        for position in range(len(self) - 1, -1, -1):
+            start = HEADER.size + position * RECORD.size
+            if mapped[start:start + 20] == raw:
+                return position
+        return None
+
+    def positions(self, commit_ids) -> Dict[str, int]:
+        """Positions de plusieurs commits en un seul parcours du fichier
+        (les têtes de centaines de branches, par exemple)."""
+        mapped = self._mapped()
+        wanted = {}
+        for commit_id in commit_ids:
+            try:
+                wanted[bytes.fromhex(commit_id)] = commit_id
+            except (TypeError, ValueError):
+                continue
+        found = {}
+        if mapped is None:
+            return found
+        for position in range(len(self) - 1, -1, -1):
+            if not wanted:
+                break
+            start = HEADER.size + position * RECORD.size
+            commit_id = wanted.pop(mapped[start:start + 20], None)
+            if commit_id is not None:
+                found[commit_id] = position
+        return found
+
+    def append(self, commit_id: str, parent_ids: List[str],
+               date: datetime, message: str, fsync: bool = True) -> int:
+        """
+        Ajoute un commit à la fin du graphe et renvoie sa position.
+        Le message est écrit avant l'enregistrement : un lecteur
+        concurrent ne voit jamais un enregistrement incomplet (la
+        taille utile est un multiple de RECORD.size) ni un message
+        manquant.
+        """
+        parents = []
+        generation = 1
+        for parent_id in parent_ids[:2]:
+            position = self.position(parent_id)
+            if position is not None:
+                parents.append(position)
+                generation = max(generation,
+                                 self.record(position).generation + 1)
+        parents += [NO_PARENT] * (2 - len(parents))
+
+        if not self.exists():
+            with open(self.path, 'wb') as f:
+                f.write(HEADER.pack(GRAPH_MAGIC, GRAPH_VERSION))
+            open(self.msgs_path, 'wb').close()
+
+        stamp = (date - EPOCH) // timedelta(microseconds=1)
+        with open(self.msgs_path, 'ab') as f:
+            msg_offset = f.tell()
+            encoded_msg = message.encode('utf-8')
+            f.write(MSG_LEN.pack(len(encoded_msg)) + encoded_msg)
+            if fsync:
+                fsync_file(f)
+        with open(self.path, 'ab') as f:
+            position = (f.tell() - HEADER.size) // RECORD.size
+            f.write(RECORD.pack(bytes.fromhex(commit_id), parents[0],
+                                parents[1], stamp, msg_offset, generation))
+            if fsync:
+                fsync_file(f)
+        return position
+
+    def rebuild(self, commits: List[dict], fsync: bool = True):
+        """
+        Reconstruit le graphe à partir des objets commit (parents avant
+        enfants, sinon ordre chronologique), par exemple pour un dépôt
+        créé avant lui ou après un `gc`. Les deux fichiers sont
+        construits en mémoire puis remplacés atomiquement, les messages
+        d'abord : les anciens enregistrements ne pointent jamais au-delà
+        du nouveau fichier de messages.
+        """
+        by_id = {commit['id']: commit for commit in commits}
+        positions: Dict[str, int] = {}
+        generations: List[int] = []
+        records, msgs = [], bytearray()
+        for root in sorted(commits, key=lambda c: c.get('date', '')):
+            stack = [root['id']]
+            while stack:
+                commit_id = stack[-1]
+                if commit_id in positions:
+                    stack.pop()
+                    continue
+                commit = by_id[commit_id]
+                parent_ids = [p for p in commit.get('parents', [])[:2]
+                              if p in by_id]
+                pending = [p for p in parent_ids if p not in positions]
+                if pending:
+                    stack.extend(pending)
+                    continue
+                stack.pop()
+                parents = [positions[p] for p in parent_ids]
+                generation = 1 + max(
+                    (generations[p] for p in parents), default=0
+                )
+                parents += [NO_PARENT] * (2 - len(parents))
+                stamp = ((datetime.fromisoformat(commit['date']) - EPOCH)
+                         // timedelta(microseconds=1))
+                encoded_msg = commit.get('message', '').encode('utf-8')
+                records.append(RECORD.pack(
+                    bytes.fromhex(commit_id), parents[0], parents[1],
+                    stamp, len(msgs), generation
+                ))
+                msgs += MSG_LEN.pack(len(encoded_msg)) + encoded_msg
+                positions[commit_id] = len(generations)
+                generations.append(generation)
+
+        self.close()
+        atomic_write(self.msgs_path, bytes(msgs), fsync)
+        atomic_write(self.path, b''.join(
+            [HEADER.pack(GRAPH_MAGIC, GRAPH_VERSION)] + records
+        ), fsync)
+
+    def walk(self, include: List[int], exclude: List[int] = (),
+             topo: bool = False) -> Iterator[CommitInfo]:
+        """
+        Ancêtres de `include` qui ne sont pas ancêtres de `exclude`, du
+        plus récent au plus ancien (date du commit, puis ordre
+        d'enregistrement). Avec `topo`, la génération passe avant la
+        date : aucun parent n'est rendu avant ses enfants, même si les
+        horloges des auteurs divergent (nécessaire au dessin du graphe).
+        Générateur : seuls les commits dépilés et
+        leurs parents directs sont lus, `log -n 10` s'arrête donc après
+        une dizaine d'enregistrements. Le parcours cesse dès qu'il ne
+        reste que des commits exclus dans le tas.
+        """
+        heap = []
+        hidden = {}     # position -> exclue ?
+        queued = set()
+        visible = 0     # commits non exclus encore dans le tas
+
+        def push(position: int, hide: bool):
+            nonlocal visible
+            if position in hidden:
+                if hide and not hidden[position]:
+                    hidden[position] = True
+                    if position in queued:
+                        visible -= 1
+                return
+            hidden[position] = hide
+            queued.add(position)
+            if not hide:
+                visible += 1
+            info = self.record(position)
+            heapq.heappush(heap, (
+                -info.generation if topo else 0,
+                EPOCH - info.date, -position, info
+            ))
+
+        for position in exclude:
+            push(position, True)
+        for position in include:
+            push(position, False)
+        while heap and visible:
+            info = heapq.heappop(heap)[-1]
+            queued.discard(info.position)
+            hide = hidden[info.position]
+            if not hide:
+                visible -= 1
+                yield info
+            for parent in info.parents:
+                push(parent, hide)
+
+    def merge_base(self, a: int, b: int) -> Optional[int]:
+        """
+        Ancêtre commun le plus proche de deux commits (positions).
+        Les commits sont dépilés par génération décroissante : un commit
+        n'est traité qu'après tous ses descendants visités, et le premier
+        atteint depuis les deux côtés est donc un meilleur ancêtre commun.
+        La marche s'arrête là, sans parcourir le reste de l'historique.
+        """
+        if a == b:
+            return a
+        flags = {a: 1, b: 2}
+        heap = [(-self.record(a).generation, a),
+                (-self.record(b).generation, b)]
+        heapq.heapify(heap)
+        while heap:
+            _, position = heapq.heappop(heap)
+            flag = flags[position]
+            if flag == 3:
+                return position
+            for parent in self.record(position).parents:
+                if parent not in flags:
+                    flags[parent] = flag
+                    heapq.heappush(
+                        heap, (-self.record(parent).generation, parent)
+                    )
+                else:
+                    flags[parent] |= flag
+        return None
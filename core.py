@@ -1,9 +1,146 @@
 # core.py
 import os
 import json
+import stat
+import zlib
 import hashlib
+from collections import OrderedDict
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from storage import PackStore, PackWriter, OBJ_BLOB, OBJ_COMMIT
+from bitmaps import ReachabilityBitmaps, bit_positions
+from blame import BlameCache, Origins
+from commitgraph import CommitGraph, CommitInfo
+from diff import matching_blocks, unified_hunks
+from index import Index
+from metrics import count
+from fsutil import (DEFAULT_FSYNC, FSYNC_ALL, FSYNC_NONE, RepoLock,
+                    atomic_write, fsync_file, locked)
+from worktree import IGNORE_FILE, IgnoreRules, relative_path, walk
+
+# Taille des blocs lus lors du hachage et de la copie des fichiers
+CHUNK_SIZE = 1024 * 1024
+# Objets (compressés) au-delà de cette taille : laissés hors des packs
+PACK_MAX_OBJECT_SIZE = 16 * 1024 * 1024
+# Écritures parallèles du checkout (surchargeable : 'checkout_jobs')
+DEFAULT_CHECKOUT_JOBS = 8
+# Nombre de commits décodés gardés en mémoire par session
+COMMIT_CACHE_SIZE = 512
+# Diffs calculés gardés en mémoire, par paire de blobs
+DIFF_CACHE_SIZE = 128
+
+
+class Repository:
+    """
+    Session d'accès au dépôt, propre au processus.
+    Garde en mémoire les petits fichiers de métadonnées (config.json,
+    refs.json) et l'index, relus seulement si leur stat change, et les
+    commits décodés dans un cache LRU borné (un commit est immuable),
+    de même que les diffs calculés, indexés par paire de hashs.
+    Une même session peut servir à plusieurs commandes successives.
+    Elle détient aussi les verrous d'écriture des dépôts ouverts.
+    """
+
+    def __init__(self, max_commits: int = COMMIT_CACHE_SIZE,
+                 max_diffs: int = DIFF_CACHE_SIZE):
+        self.max_commits = max_commits
+        self.max_diffs = max_diffs
+        self._files: Dict[str, Tuple[Tuple, Dict]] = {}
+        self._commits: 'OrderedDict[str, Dict]' = OrderedDict()
+        self._diffs: 'OrderedDict[Tuple, Tuple[str, ...]]' = OrderedDict()
+        self._locks: Dict[str, RepoLock] = {}
+        # Dernier index lu : ((stat index, stat journal), Index)
+        self._index: Optional[Tuple[Tuple, Index]] = None
+
+    @staticmethod
+    def _stamp(path: str) -> Optional[Tuple]:
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def load_json(self, path: str) -> Dict:
+        """
+        Contenu JSON de `path` ({} si absent). Renvoie une copie :
+        l'appelant peut la modifier puis la sauvegarder.
+        """
+        stamp = self._stamp(path)
+        if stamp is None:
+            self._files.pop(path, None)
+            return {}
+        cached = self._files.get(path)
+        if cached is not None and cached[0] == stamp:
+            count('json_cache_hits')
+        else:
+            count('json_loads')
+            count('bytes_read', stamp[1])
+            with open(path, 'r', encoding='utf-8') as f:
+                try:
+                    cached = (stamp, json.load(f))
+                except json.JSONDecodeError as e:
+                    raise RuntimeError(
+                        f"Fichier corrompu : {path} ({e})"
+                    ) from e
+            self._files[path] = cached
+        return dict(cached[1])
+
+    def save_json(self, path: str, data: Dict, fsync: bool = True):
+        """Écriture atomique (fichier temporaire puis renommage)."""
+        encoded = json.dumps(data, indent=2).encode('utf-8')
+        count('json_saves')
+        count('bytes_written', len(encoded))
+        atomic_write(path, encoded, fsync)
+        self._files[path] = (self._stamp(path), dict(data))
+
+    def lock(self, vcs_dir: str) -> RepoLock:
+        """Verrou d'écriture (réentrant) du dépôt `vcs_dir`."""
+        if vcs_dir not in self._locks:
+            self._locks[vcs_dir] = RepoLock(vcs_dir)
+        return self._locks[vcs_dir]
+
+    def load_index(self, index: Index) -> Index:
+        """
+        Charge `index`, ou renvoie une copie de l'index déjà lu si ni le
+        fichier ni son journal n'ont changé depuis.
+        """
+        stamp = (self._stamp(index.path), self._stamp(index.journal_path))
+        cached = self._index
+        if (cached is not None and cached[0] == stamp
+                and cached[1].path == index.path):
+            return cached[1].copy()
+        index.load()
+        self._index = (stamp, index.copy())
+        return index
+
+    def get_commit(self, commit_id: str) -> Optional[Dict]:
+        """Commit décodé s'il est en cache (à ne pas modifier)."""
+        commit = self._commits.get(commit_id)
+        if commit is not None:
+            count('commit_cache_hits')
+            self._commits.move_to_end(commit_id)
+        return commit
+
+    def put_commit(self, commit_id: str, commit: Dict):
+        self._commits[commit_id] = commit
+        self._commits.move_to_end(commit_id)
+        while len(self._commits) > self.max_commits:
+            self._commits.popitem(last=False)
+
+    def get_diff(self, key: Tuple) -> Optional[Tuple[str, ...]]:
+        """Lignes d'un diff déjà calculé ((hash a, hash b, contexte))."""
+        hunks = self._diffs.get(key)
+        if hunks is not None:
+            count('diff_cache_hits')
+            self._diffs.move_to_end(key)
+        return hunks
+
+    def put_diff(self, key: Tuple, hunks: Tuple[str, ...]):
+        self._diffs[key] = hunks
+        self._diffs.move_to_end(key)
+        while len(self._diffs) > self.max_diffs:
+            self._diffs.popitem(last=False)
 
 
 class VersionControl:
@@ -13,12 +150,31 @@ class VersionControl:
     répertoire de travail.
     """
 
-    def __init__(self, repo_path: str = '.'):
+    def __init__(self, repo_path: str = '.',
+                 repository: Optional[Repository] = None):
         self.repo_path = os.path.abspath(repo_path)
+        # Cache de session (config, refs, commits), partageable
+        self.repo = repository if repository is not None else Repository()
         self.vcs_dir = os.path.join(self.repo_path, '.mini_vcs')
+        self.index_file = os.path.join(self.vcs_dir, 'index')
+        # Ancien format du staging, relu une fois pour migration
         self.staging_file = os.path.join(self.vcs_dir, 'staging.json')
         self.commits_dir = os.path.join(self.vcs_dir, 'commits')
+        self.objects_dir = os.path.join(self.vcs_dir, 'objects')
+        self.packs_dir = os.path.join(self.vcs_dir, 'packs')
+        self.packs = PackStore(self.packs_dir)
         self.config_file = os.path.join(self.vcs_dir, 'config.json')
+        self.refs_file = os.path.join(self.vcs_dir, 'refs.json')
+        self.graph = CommitGraph(self.vcs_dir)
+        self.bitmaps = ReachabilityBitmaps(self.vcs_dir, self.graph)
+        self.blame_cache = BlameCache(self.vcs_dir)
+        # Règles .mini_vcsignore compilées (recompilées si modifiées)
+        self._ignore_rules = None
+        self._ignore_stamp = None
+        # Surveillance inotify (start_fsmonitor) et dernier état connu
+        # du répertoire de travail : (règles utilisées, {chemin: stat})
+        self._fsmonitor = None
+        self._worktree = None
 
     def init_repo(self):
         """Initialise la structure du dépôt (.mini_vcs)."""
@@ -28,98 +184,783 @@ class VersionControl:
 
         os.makedirs(self.vcs_dir, exist_ok=True)
         os.makedirs(self.commits_dir, exist_ok=True)
+        os.makedirs(self.objects_dir, exist_ok=True)
 
         # Configuration initiale : HEAD pointe vers la branche 'main'
         self._save_json(self.config_file, {'head': 'main'})
         print(f"✅ Dépôt initialisé dans {self.vcs_dir}")
 
-    def add(self, files: List[str]):
-        """Ajoute des fichiers à l'index (staging area)."""
+    def lock(self) -> RepoLock:
+        """
+        Verrou d'écriture du dépôt. Les commandes qui modifient le dépôt
+        le prennent ; les lectures (log, status, graph) n'en ont pas
+        besoin : chaque fichier est remplacé de façon atomique.
+        """
+        return self.repo.lock(self.vcs_dir)
+
+    def start_fsmonitor(self) -> bool:
+        """
+        Active la surveillance inotify du répertoire de travail (Linux,
+        processus de longue durée : démon, shell interactif) si la clé
+        'fsmonitor' de config.json est vraie. status et `add .` ne
+        relisent alors que les chemins modifiés depuis l'appel
+        précédent.
+        """
+        if not os.path.exists(self.config_file):
+            return False
+        if not self._load_json(self.config_file).get('fsmonitor'):
+            return False
+        from fsmonitor import FSMonitor
+        if self._fsmonitor is None:
+            monitor = FSMonitor(self.repo_path, self._get_ignore_rules())
+            if not monitor.start():
+                return False
+            self._fsmonitor = monitor
+        return True
+
+    @locked
+    def add(self, files: List[str], jobs: int = 1):
+        """
+        Ajoute des fichiers à l'index (staging area).
+        Avec `jobs` > 1, lecture, hachage et compression sont répartis
+        sur un pool de threads (hashlib et zlib libèrent le GIL) ;
+        seuls les chemins modifiés sont ajoutés au journal de l'index.
+        """
         if not os.path.exists(self.vcs_dir):
             raise RuntimeError("Dépôt non initialisé. Lancez 'init' d'abord.")
 
-        current_staging = self._load_json(self.staging_file)
+        index = self._load_index()
+        paths = self._expand_paths(files, index)
 
-        for filename in files:
-            path = os.path.join(self.repo_path, filename)
-            if os.path.exists(path):
-                with open(path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                # On stocke le contenu et son hash (SHA-1)
-                file_hash = self._compute_hash(content)
-                current_staging[filename] = {
-                    'content': content,
-                    'hash': file_hash,
-                    'added_at': datetime.now().isoformat()
-                }
+        to_store = []
+        for filename, st in paths:
+            if st is not None:
+                entry = index.entries.get(filename)
+                # Stat inchangé : le hash connu est toujours valable
+                if entry is None or not index.stat_matches(entry, st):
+                    to_store.append((filename, st))
+            elif filename in index.entries:
+                # Fichier suivi supprimé du disque : suppression indexée
+                index.remove(filename)
             else:
                 print(f"⚠ Fichier introuvable : {filename}")
 
-        self._save_json(self.staging_file, current_staging)
-        print(f"✅ {len(files)} fichier(s) mis à jour dans le staging.")
+        # Le contenu part dans objects/ (en flux, par blocs), l'index ne
+        # garde que la référence (SHA-1) et le stat
+        full_paths = [os.path.join(self.repo_path, filename)
+                      for filename, _ in to_store]
+        if jobs > 1 and len(to_store) > 1:
+            # Import différé : inutile (et coûteux) au démarrage
+            from concurrent.futures import ThreadPoolExecutor
+            with ThreadPoolExecutor(max_workers=jobs) as pool:
+                hashes = list(pool.map(self._write_object_from_file,
+                                       full_paths))
+        else:
+            hashes = [self._write_object_from_file(p) for p in full_paths]
+        for (filename, st), file_hash in zip(to_store, hashes):
+            index.set(filename, file_hash, st)
 
+        index.flush()
+        print(f"✅ {len(paths)} fichier(s) mis à jour dans le staging.")
+
+    @locked
     def commit(self, msg: str) -> Optional[str]:
-        """Crée un commit (snapshot) à partir du staging."""
-        current_staging = self._load_json(self.staging_file)
-        if not current_staging:
+        """Crée un commit (snapshot) à partir de l'index."""
+        # Le parent est le commit pointé par la branche courante ;
+        # un merge en attente (conflits résolus) ajoute un second parent.
+        parent_commit = self._get_head_commit()
+        parents = [parent_commit] if parent_commit else []
+        config = self._load_json(self.config_file)
+        merge_head = config.pop('merge_head', None)
+        if merge_head:
+            parents.append(merge_head)
+
+        # Snapshot complet : l'arbre décrit par l'index
+        index = self._load_index()
+        files = index.tree()
+        parent_data = self._load_commit(parent_commit) or {}
+        if files == parent_data.get('files', {}) and not merge_head:
             print("❌ Rien à commiter (staging vide).")
             return None
 
-        # Création de l'objet commit
-        commit_id = self._compute_hash(msg + datetime.now().isoformat())
-        head_branch = self._get_head()
+        commit_id = self._write_commit(msg, files, parents)
+        # Le journal de l'index est fusionné à chaque commit
+        if index.journal_count or not index.exists():
+            self._save_index(index)
 
-        # Note: Dans un vrai git, le parent est le hash du commit précédent.
-        # Ici pour simplifier, on stockera la référence dans branches.py,
-        # mais core doit connaître le parent direct s'il existe.
-        # Pour ce mini-projet, 'parent' est géré via les refs externes
-        # ou simplement lié au HEAD courant.
+        # Fin du merge en attente après commit
+        if merge_head:
+            self._save_json(self.config_file, config)
 
-        commit_data = {
-            'id': commit_id,
-            'message': msg,
-            'date': datetime.now().isoformat(),
-            'files': current_staging,  # Snapshot complet des fichiers
-            'parent': head_branch  # Simplification pédagogique
-        }
+        # Le HEAD est mis à jour par BranchManager, mais core renvoie l'ID
+        return commit_id
 
-        # Sauvegarde du commit
-        commit_path = os.path.join(self.commits_dir, f"{commit_id}.json")
-        self._save_json(commit_path, commit_data)
+    def merge_base(self, commit_a: str, commit_b: str) -> Optional[str]:
+        """Ancêtre commun le plus proche de deux commits (commit-graph)."""
+        self._ensure_commit_graph()
+        pos_a = self.graph.position(commit_a)
+        pos_b = self.graph.position(commit_b)
+        if pos_a is None or pos_b is None:
+            return None
+        base = self.graph.merge_base(pos_a, pos_b)
+        return self.graph.record(base).id if base is not None else None
 
-        # Nettoyage du staging après commit
-        os.remove(self.staging_file)
+    def log(self, revs: Optional[List[str]] = None,
+            since: Optional[datetime] = None,
+            until: Optional[datetime] = None,
+            paths: Optional[List[str]] = None) -> Iterator[CommitInfo]:
+        """
+        Historique, du plus récent au plus ancien, sous forme de
+        générateur (commit-graph uniquement, sauf filtre de chemins).
+        `revs` : branches, identifiants (ou préfixes), 'HEAD', 'A..B'
+        (accessible depuis B mais pas depuis A) ou '^A' ; HEAD par
+        défaut. `paths` : seuls les commits qui modifient ces fichiers
+        ou répertoires.
+        """
+        self._ensure_commit_graph()
+        if paths:
+            relative = []
+            for path in paths:
+                rel = relative_path(self.repo_path, path)
+                if rel is None:
+                    raise ValueError(f"Hors du dépôt : {path}")
+                relative.append(rel)
+            # '.' (la racine) ne filtre rien
+            paths = None if '' in relative else relative
+        include, exclude = [], []
+        for rev in revs or ['HEAD']:
+            if '..' in rev:
+                start, end = rev.split('..', 1)
+                exclude.append(start or 'HEAD')
+                include.append(end or 'HEAD')
+            elif rev.startswith('^'):
+                exclude.append(rev[1:])
+            else:
+                include.append(rev)
+        include = self._rev_positions(include)
+        exclude = self._rev_positions(exclude)
 
-        # Le HEAD est mis à jour par BranchManager, mais core renvoie l'ID
-        return commit_id
+        if exclude:
+            # Plage (A..B, ^A) : différence de bitmaps, sans parcours
+            history = self._range(include, exclude)
+        else:
+            # Parcours paresseux : `log -n 10` s'arrête tôt
+            history = self.graph.walk(include)
+        for info in history:
+            if until is not None and info.date > until:
+                continue
+            if since is not None and info.date < since:
+                # Parcours par date décroissante : le reste est plus ancien
+                return
+            if paths and not self._touches(info.id, paths):
+                continue
+            yield info
+
+    def _range(self, include: List[int],
+               exclude: List[int]) -> List[CommitInfo]:
+        """
+        Commits accessibles depuis `include` mais pas depuis `exclude`
+        (positions), du plus récent au plus ancien comme
+        `CommitGraph.walk` : union et différence de bitmaps.
+        """
+        self._tip_positions()
+        selected = 0
+        for position in include:
+            selected |= self.bitmaps.bitmap(position)
+        for position in exclude:
+            selected &= ~self.bitmaps.bitmap(position)
+        infos = [self.graph.record(p) for p in bit_positions(selected)]
+        infos.sort(key=lambda info: (info.date, info.position), reverse=True)
+        return infos
+
+    def _tip_positions(self) -> Dict[str, int]:
+        """Positions des têtes de branche dans le commit-graph ; met au
+        passage leurs bitmaps d'accessibilité à jour (seules les
+        branches qui ont bougé sont recalculées)."""
+        self._ensure_commit_graph()
+        return self.bitmaps.sync(self._load_json(self.refs_file))
+
+    def _rev_positions(self, revs: List[str]) -> List[int]:
+        """Positions dans le commit-graph des révisions `revs` (une
+        branche encore vide n'en a pas)."""
+        commit_ids = [self._resolve_rev(rev) for rev in revs]
+        # Un seul passage sur le commit-graph pour toutes les révisions
+        found = self.graph.positions(c for c in commit_ids if c)
+        return [found[c] for c in commit_ids if c in found]
+
+    def _resolve_rev(self, rev: str) -> Optional[str]:
+        """
+        Identifiant de commit désigné par `rev` : 'HEAD', nom de
+        branche, identifiant complet ou préfixe non ambigu (4 caractères
+        au moins). None pour une branche sans commit ; ValueError si la
+        révision est inconnue.
+        """
+        if rev == 'HEAD':
+            return self._get_head_commit()
+        refs = self._load_json(self.refs_file)
+        if rev in refs:
+            return refs[rev]
+        if rev == self._get_head():
+            # Branche courante encore sans commit
+            return None
+        if len(rev) >= 4 and all(c in '0123456789abcdef' for c in rev):
+            matches = [info.id for info in self.graph.records()
+                       if info.id.startswith(rev)]
+            if len(matches) == 1:
+                return matches[0]
+            if matches:
+                raise ValueError(f"Révision ambiguë : {rev}")
+        raise ValueError(f"Révision inconnue : {rev}")
+
+    def diff(self, revs: Optional[List[str]] = None, cached: bool = False,
+             paths: Optional[List[str]] = None
+             ) -> Iterator[Tuple[str, Optional[Dict], Optional[Dict]]]:
+        """
+        Fichiers différents entre deux états, par ordre de chemin :
+        (chemin, entrée avant, entrée après), None pour un fichier
+        absent d'un côté.
+        - sans révision : index -> répertoire de travail
+          (`cached` : HEAD -> index)
+        - une révision : commit -> répertoire de travail (ou index)
+        - deux révisions, ou 'A..B' : commit A -> commit B
+        Les arbres sont comparés par hash : un fichier identique des
+        deux côtés n'est jamais lu. Côté disque, seuls les fichiers dont
+        le stat a changé depuis l'index sont rehachés.
+        """
+        revs = list(revs or [])
+        if len(revs) == 1 and '..' in revs[0]:
+            start, end = revs[0].split('..', 1)
+            revs = [start or 'HEAD', end or 'HEAD']
+        if len(revs) > 2 or (len(revs) == 2 and cached):
+            raise ValueError("Trop de révisions.")
+        if paths:
+            relative = []
+            for path in paths:
+                rel = relative_path(self.repo_path, path)
+                if rel is None:
+                    raise ValueError(f"Hors du dépôt : {path}")
+                relative.append(rel)
+            paths = None if '' in relative else relative
+
+        def tree(rev: str) -> Dict:
+            commit_id = self._resolve_rev(rev)
+            return (self._load_commit(commit_id) or {}).get('files', {})
+
+        if len(revs) == 2:
+            old, new = tree(revs[0]), tree(revs[1])
+        else:
+            index = self._load_index()
+            if revs:
+                old = tree(revs[0])
+            elif cached:
+                old = tree('HEAD')
+            else:
+                old = index.tree()
+            new = index.tree() if cached else self._worktree_tree(index)
+
+        if paths:
+            prefixes = tuple(p.rstrip('/') + '/' for p in paths)
+            names = [name for name in set(old) | set(new)
+                     if name in paths or name.startswith(prefixes)]
+        else:
+            names = set(old) | set(new)
+        for name in sorted(names):
+            before, after = old.get(name), new.get(name)
+            if (before or {}).get('hash') != (after or {}).get('hash'):
+                yield name, before, after
+
+    def diff_hunks(self, before: Optional[Dict], after: Optional[Dict],
+                   context: int = 3) -> Optional[Tuple[str, ...]]:
+        """
+        Blocs @@ du diff unifié entre deux entrées de `diff` (None pour
+        un fichier binaire). Le résultat est gardé en cache par paire de
+        hashs : revoir le même changement ne relit ni ne recalcule rien.
+        """
+        key = ((before or {}).get('hash'), (after or {}).get('hash'),
+               context)
+        hunks = self.repo.get_diff(key)
+        if hunks is not None:
+            return hunks
+        old, new = self._diff_bytes(before), self._diff_bytes(after)
+        # Octet nul : binaire, même si le contenu se décode
+        if b'\0' in old or b'\0' in new:
+            return None
+        try:
+            old_lines = old.decode('utf-8').splitlines(keepends=True)
+            new_lines = new.decode('utf-8').splitlines(keepends=True)
+        except UnicodeDecodeError:
+            return None
+        hunks = tuple(unified_hunks(old_lines, new_lines, context))
+        count('files_diffed')
+        self.repo.put_diff(key, hunks)
+        return hunks
+
+    def _diff_bytes(self, data: Optional[Dict]) -> bytes:
+        """Contenu d'une entrée de `diff` : objet stocké, ou fichier du
+        disque (clé 'path') pour le répertoire de travail."""
+        if data is None:
+            return b''
+        if 'path' not in data:
+            return self._blob_bytes(data)
+        with open(data['path'], 'rb') as f:
+            content = f.read()
+        count('bytes_read', len(content))
+        return content
+
+    def _worktree_tree(self, index: Index) -> Dict:
+        """
+        Arbre du répertoire de travail pour les fichiers suivis
+        (format des commits, plus le chemin sur le disque). Le hash de
+        l'index est repris tant que le stat n'a pas changé.
+        """
+        tree = {}
+        for name, entry in index.entries.items():
+            path = os.path.join(self.repo_path, name)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            if index.stat_matches(entry, st):
+                file_hash = entry.hash
+            else:
+                file_hash = self._hash_file(path)
+            tree[name] = {'hash': file_hash, 'path': path}
+        return tree
+
+    def blame(self, path: str, rev: str = 'HEAD') -> List[Tuple[str, str]]:
+        """
+        Commit d'origine de chaque ligne de `path` à la révision `rev` :
+        [(commit, ligne), ...]. Les origines déjà calculées (sur le
+        disque) arrêtent le parcours : seuls les commits plus récents
+        sont traités.
+        """
+        rel = relative_path(self.repo_path, path)
+        if not rel:
+            raise ValueError(f"Hors du dépôt : {path}")
+        commit_id = self._resolve_rev(rev)
+        commit = self._load_commit(commit_id) if commit_id else None
+        data = (commit or {}).get('files', {}).get(rel)
+        if data is None:
+            raise ValueError(f"{rel} absent de {rev}")
+        lines = self._blame_lines(data)
+
+        cached = self.blame_cache.load(rel)
+        known: Dict[str, Optional[Origins]] = dict(cached)
+        computed = self._line_origins(rel, commit_id, known)
+        if computed or commit_id not in cached:
+            # Le commit annoté est gardé même s'il ne modifie pas le
+            # fichier : le prochain blame s'arrête directement dessus
+            computed[commit_id] = known[commit_id]
+            cached.update(computed)
+            self.blame_cache.save(rel, cached)
+        return list(zip(known[commit_id][1], lines))
+
+    def _line_origins(self, rel: str, commit_id: str,
+                      known: Dict[str, Optional[Origins]]
+                      ) -> Dict[str, Origins]:
+        """
+        Complète `known` (commit -> origines, None si le fichier est
+        absent) jusqu'à `commit_id`, en post-ordre itératif : les
+        parents d'un commit sont traités avant lui. Un commit qui garde
+        le hash d'un parent reprend ses origines sans diff ; sinon, ses
+        lignes communes avec chaque parent (diff de Myers) héritent de
+        leur origine, les autres viennent de lui. Renvoie les origines
+        calculées pour les commits qui modifient le fichier.
+        """
+        computed: Dict[str, Origins] = {}
+        # Entrée de snapshot de chaque commit (relue pour les parents)
+        entries: Dict[str, Dict] = {}
+        # (commit, None) : à développer ; (commit, parents) : prêt
+        stack = [(commit_id, None)]
+        while stack:
+            current, parents = stack.pop()
+            if current in known:
+                continue
+            if parents is None:
+                commit = self._load_commit(current) or {}
+                data = commit.get('files', {}).get(rel)
+                if data is None:
+                    known[current] = None
+                    continue
+                entries[current] = data
+                # Ancien commit sans 'parents' ('parent' est un nom de
+                # branche) : racine
+                parents = commit.get('parents', [])
+                stack.append((current, parents))
+                stack.extend((p, None) for p in parents if p not in known)
+                continue
 
-    def checkout_snapshot(self, commit_id: str):
+            data = entries[current]
+            versions = [(p, known[p]) for p in parents
+                        if known[p] is not None]
+            # Fichier inchangé par rapport à un parent : pas de diff
+            same = next((version for _, version in versions
+                         if version[0] == data.get('hash')), None)
+            if same is not None:
+                known[current] = same
+                continue
+            lines = self._blame_lines(data)
+            origins: List[Optional[str]] = [None] * len(lines)
+            for parent, (blob, parent_origins) in versions:
+                parent_lines = self._blame_lines(
+                    entries.get(parent, {'hash': blob})
+                )
+                count('files_diffed')
+                for i, j, size in matching_blocks(parent_lines, lines):
+                    for k in range(size):
+                        if origins[j + k] is None:
+                            origins[j + k] = parent_origins[i + k]
+            known[current] = computed[current] = (
+                data.get('hash'), [o or current for o in origins]
+            )
+        return computed
+
+    def _blame_lines(self, data: Dict) -> List[str]:
+        """Lignes d'une entrée de snapshot (ValueError si binaire)."""
+        content = self._blob_bytes(data)
+        if b'\0' not in content:
+            try:
+                return content.decode('utf-8').splitlines()
+            except UnicodeDecodeError:
+                pass
+        raise ValueError("Fichier binaire : pas de blame.")
+
+    def _touches(self, commit_id: str, paths: List[str]) -> bool:
+        """
+        Vrai si le commit modifie un des chemins `paths` (fichier ou
+        répertoire) par rapport à son parent. Un merge n'est retenu que
+        s'il diffère de tous ses parents sur ces chemins.
+        """
+        prefixes = tuple(p.rstrip('/') + '/' for p in paths)
+
+        def selected(files: Dict) -> Dict:
+            return {name: data.get('hash') for name, data in files.items()
+                    if name in paths or name.startswith(prefixes)}
+
+        commit = self._load_commit(commit_id) or {}
+        mine = selected(commit.get('files', {}))
+        parents = commit.get('parents', [])
+        if not parents:
+            return bool(mine)
+        return all(
+            mine != selected((self._load_commit(parent) or {})
+                             .get('files', {}))
+            for parent in parents
+        )
+
+    @locked
+    def checkout_snapshot(self, commit_id: str,
+                          from_commit: Optional[str] = None,
+                          jobs: Optional[int] = None):
         """
         Restaure les fichiers de travail à l'état d'un commit spécifique.
         C'est ce qui permet de 'voyager dans le temps' ou changer de branche.
+        Seuls les fichiers dont le hash diffère de `from_commit` (l'état
+        actuel) sont écrits, par `jobs` threads ; ceux absents de la
+        cible sont supprimés.
         """
-        commit_path = os.path.join(self.commits_dir, f"{commit_id}.json")
-        if not os.path.exists(commit_path):
+        commit_data = self._load_commit(commit_id)
+        if commit_data is None:
             msg = (f"⚠ Commit {commit_id} introuvable "
                    "(peut-être un nom de branche vide ?)")
             print(msg)
             return
 
-        commit_data = self._load_json(commit_path)
         files_snapshot = commit_data.get('files', {})
+        current_data = self._load_commit(from_commit) or {}
+        # Modifications indexées gardées, si le commit cible ne touche
+        # pas à ces fichiers (ValueError sinon, avant toute écriture)
+        staged = (self._carry_staged(current_data.get('files', {}),
+                                     files_snapshot)
+                  if from_commit else [])
+        if from_commit:
+            # Modifications non indexées : refus plutôt que perte
+            self._check_worktree(current_data.get('files', {}),
+                                 files_snapshot)
 
         print(f"🔄 Restauration des fichiers du commit {commit_id[:7]}...")
-        for filename, data in files_snapshot.items():
-            full_path = os.path.join(self.repo_path, filename)
-            with open(full_path, 'w', encoding='utf-8') as f:
-                f.write(data['content'])
-        print("✅ Espace de travail mis à jour.")
+        written, deleted = self._apply_tree_changes(
+            current_data.get('files', {}), files_snapshot, jobs
+        )
+        # L'index reflète désormais le commit restauré
+        self._update_index(files_snapshot, written, staged)
+        print(f"✅ Espace de travail mis à jour ({len(written)} écrit(s), "
+              f"{deleted} supprimé(s)).")
+
+    @locked
+    def repack(self) -> Optional[str]:
+        """
+        Regroupe les commits et objets (détachés ou déjà packés) dans un
+        unique packfile compressé. Les versions successives d'un même
+        fichier sont stockées en delta de la version précédente.
+        """
+        if not os.path.exists(self.vcs_dir):
+            raise RuntimeError("Dépôt non initialisé. Lancez 'init' d'abord.")
+        commits = [self._load_commit(cid) for cid in self._list_commit_ids()]
+        return self._repack(commits)
+
+    @locked
+    def gc(self) -> Dict[str, int]:
+        """
+        Supprime les commits et objets inaccessibles depuis les branches
+        (refs.json, dont HEAD) et l'index, puis regroupe le reste dans
+        un pack et reconstruit le commit-graph. Le marquage part des
+        têtes : seul l'historique vivant est lu.
+        """
+        if not os.path.exists(self.vcs_dir):
+            raise RuntimeError("Dépôt non initialisé. Lancez 'init' d'abord.")
+        reachable, live = self._mark_reachable()
+
+        dead_commits = set(self._list_commit_ids()) - set(reachable)
+        dead_objects = ((set(self._list_loose_objects())
+                         | set(self.packs.keys(OBJ_BLOB))) - live)
+        self._repack(list(reachable.values()), live)
+        if dead_commits or not self.graph.exists():
+            self.graph.rebuild(list(reachable.values()),
+                               self._fsync_policy() != FSYNC_NONE)
+            # Positions renumérotées : bitmaps à recalculer
+            self.bitmaps.clear()
+        if dead_commits:
+            # Les origines en cache peuvent citer des commits supprimés
+            self.blame_cache.clear()
+
+        print(f"🧹 {len(dead_commits)} commit(s) et {len(dead_objects)} "
+              f"objet(s) inaccessibles supprimés.")
+        return {'commits': len(dead_commits), 'objects': len(dead_objects)}
+
+    def fsck(self, jobs: Optional[int] = None) -> List[str]:
+        """
+        Vérifie que chaque objet stocké (détaché ou packé) correspond à
+        son hash, puis que l'historique accessible ne référence aucun
+        commit ou objet absent. Renvoie la liste des problèmes.
+        Décompression et hachage sollicitent le CPU : les lots d'objets
+        sont répartis sur un pool de processus (`jobs`, par défaut un
+        par cœur) plutôt que sur des threads, bridés par le GIL.
+        """
+        # Différé : inutile aux autres commandes
+        from fsck import batches, pack_batches, verify
+        if not os.path.exists(self.vcs_dir):
+            raise RuntimeError("Dépôt non initialisé. Lancez 'init' d'abord.")
+
+        loose_commits = []
+        if os.path.exists(self.commits_dir):
+            loose_commits = sorted(
+                fname[:-len('.json')]
+                for fname in os.listdir(self.commits_dir)
+                if fname.endswith('.json')
+            )
+        tasks = (batches('loose', self.objects_dir,
+                         sorted(self._list_loose_objects()))
+                 + batches('commit', self.commits_dir, loose_commits))
+        for pack in self.packs.packs():
+            tasks += pack_batches(pack)
+
+        jobs = jobs or os.cpu_count() or 1
+        if jobs == 1 or len(tasks) <= 1:
+            results = [verify(task) for task in tasks]
+        else:
+            from concurrent.futures import ProcessPoolExecutor
+            with ProcessPoolExecutor(
+                    max_workers=min(jobs, len(tasks))) as pool:
+                results = list(pool.map(verify, tasks))
+        problems = [problem for result in results for problem in result]
+
+        # Connectivité : commits et objets référencés mais absents
+        missing = []
+        _reachable, live = self._mark_reachable(missing)
+        problems += [f"commit {cid[:7]} : référencé mais absent"
+                     for cid in missing]
+        for file_hash in sorted(live):
+            if not (os.path.exists(self._object_path(file_hash))
+                    or self.packs.contains(file_hash)):
+                problems.append(f"objet {file_hash[:7]} : référencé mais "
+                                f"absent")
+        return problems
+
+    def _mark_reachable(self, missing: Optional[List[str]] = None
+                        ) -> Tuple[Dict[str, Dict], Set[str]]:
+        """
+        Commits accessibles depuis les branches et une fusion en cours
+        (id -> commit) et hash des objets qu'ils ou l'index référencent.
+        Un commit introuvable est ajouté à `missing` si la liste est
+        fournie ; sinon c'est une erreur (gc ne doit rien supprimer d'un
+        historique incomplet).
+        """
+        refs = self._load_json(self.refs_file)
+        stack = [cid for cid in refs.values() if cid]
+        # Fusion en attente de commit : son second parent doit survivre
+        merge_head = self._load_json(self.config_file).get('merge_head')
+        if merge_head:
+            stack.append(merge_head)
+        live = {entry.hash for entry in self._load_index().entries.values()}
+        commits: Dict[str, Dict] = {}
+        while stack:
+            commit_id = stack.pop()
+            if commit_id in commits:
+                continue
+            commit = self._load_commit(commit_id)
+            if commit is None:
+                if missing is None:
+                    raise RuntimeError(
+                        f"Commit {commit_id[:7]} introuvable : lancez "
+                        f"'fsck'."
+                    )
+                if commit_id not in missing:
+                    missing.append(commit_id)
+                continue
+            commits[commit_id] = commit
+            # Les anciens commits à contenu en ligne n'ont pas d'objet
+            live.update(data['hash']
+                        for data in commit.get('files', {}).values()
+                        if 'content' not in data)
+            # Un commit antérieur aux parents réels n'a que 'parent', qui
+            # contient un nom de branche : c'est une racine
+            stack.extend(commit.get('parents', []))
+        return commits, live
+
+    def _repack(self, commits: List[Dict],
+                live: Optional[Set[str]] = None) -> Optional[str]:
+        """
+        Écrit `commits` et leurs objets dans un nouveau pack puis
+        supprime les anciens packs, les objets détachés et les commits
+        détachés. Avec `live`, seuls ces objets non référencés par les
+        commits sont conservés (gc) ; sinon tous le sont.
+        """
+        commits = sorted(commits, key=lambda c: c.get('date', ''))
+
+        old_packs = [pack.pack_path for pack in self.packs.packs()]
+        loose_objects = self._list_loose_objects()
+        writer = PackWriter(self.packs_dir)
+        written = set()
+        # Gros objets laissés détachés (lecture en flux au checkout)
+        kept_loose = set()
+        # Dernière version écrite de chaque chemin : base des deltas
+        last_version = {}
+
+        for commit in commits:
+            files = {}
+            for filename, data in commit.get('files', {}).items():
+                file_hash = data['hash']
+                files[filename] = {'hash': file_hash}
+                if file_hash in written or file_hash in kept_loose:
+                    continue
+                if self._too_big_to_pack(file_hash):
+                    kept_loose.add(file_hash)
+                    continue
+                content = self._blob_bytes(data)
+                offset = writer.add(file_hash, OBJ_BLOB, content,
+                                    last_version.get(filename))
+                last_version[filename] = (offset, content)
+                written.add(file_hash)
+            # Les anciens commits à contenu en ligne sont allégés au passage
+            commit = dict(commit, files=files)
+            packed = json.dumps(commit, separators=(',', ':'))
+            writer.add(commit['id'], OBJ_COMMIT, packed.encode('utf-8'))
+
+        # Objets non référencés par un commit (ex. staging en cours)
+        orphans = set(loose_objects) | set(self.packs.keys(OBJ_BLOB))
+        if live is not None:
+            orphans &= live
+        for file_hash in sorted(orphans - written - kept_loose):
+            if self._too_big_to_pack(file_hash):
+                kept_loose.add(file_hash)
+                continue
+            writer.add(file_hash, OBJ_BLOB,
+                       self._read_object_bytes(file_hash))
+
+        pack_path = writer.finish(self._fsync_policy() != FSYNC_NONE)
+
+        # Nettoyage : tout ce qui est conservé est désormais lisible
+        # depuis le nouveau pack
+        self.packs.close()
+        for old in old_packs:
+            if old != pack_path:
+                os.remove(old)
+                os.remove(old[:-len('.pack')] + '.idx')
+        for file_hash in set(loose_objects) - kept_loose:
+            path = self._object_path(file_hash)
+            os.remove(path)
+            if not os.listdir(os.path.dirname(path)):
+                os.rmdir(os.path.dirname(path))
+        if os.path.exists(self.commits_dir):
+            for fname in os.listdir(self.commits_dir):
+                if fname.endswith('.json'):
+                    os.remove(os.path.join(self.commits_dir, fname))
+
+        if pack_path is None:
+            print("Rien à packer.")
+            return None
+        size_kb = os.path.getsize(pack_path) / 1024
+        print(f"📦 {len(writer.entries)} objet(s) regroupé(s) dans "
+              f"{os.path.basename(pack_path)} ({size_kb:.1f} Ko)")
+        return pack_path
 
     def get_status_data(self) -> Dict:
-        """Retourne les données brutes du status pour affichage."""
+        """
+        Retourne les données brutes du status pour affichage.
+        Compare l'index au dernier commit (staging) et au disque ; seuls
+        les fichiers dont le stat a changé depuis l'index sont relus.
+        """
+        # Relevé avant la lecture : une écriture concurrente le change
+        index_stamp = self._index_stamp()
+        index = self._load_index()
+        head_data = self._load_commit(self._get_head_commit()) or {}
+        head_files = head_data.get('files', {})
+
+        # Un seul parcours du disque (ou les seuls chemins signalés par
+        # le fsmonitor) : stat des fichiers et non suivis
+        on_disk = self._worktree_files()
+
+        staged, unchanged, modified, deleted = [], [], [], []
+        refreshed = False
+        for filename, entry in index.entries.items():
+            if head_files.get(filename, {}).get('hash') != entry.hash:
+                staged.append(filename)
+
+            st = on_disk.get(filename)
+            if st is None:
+                # Fichier suivi mais ignoré, ou réellement supprimé
+                try:
+                    st = os.stat(os.path.join(self.repo_path, filename))
+                except FileNotFoundError:
+                    deleted.append(filename)
+                    continue
+            if index.stat_matches(entry, st):
+                unchanged.append(filename)
+                continue
+            file_hash = self._hash_file(
+                os.path.join(self.repo_path, filename)
+            )
+            if file_hash == entry.hash:
+                # Contenu identique : on mémorise le nouveau stat
+                index.set(filename, file_hash, st)
+                refreshed = True
+                unchanged.append(filename)
+            else:
+                modified.append(filename)
+        # Rafraîchissement opportuniste : ignoré si un autre processus
+        # écrit (status ne bloque jamais)
+        if refreshed and self.lock().acquire(blocking=False):
+            try:
+                # Un `add` concurrent a pu écrire l'index depuis sa
+                # lecture : nos entrées périmées annuleraient ses
+                # modifications, le rafraîchissement attendra
+                if self._index_stamp() == index_stamp:
+                    index.flush()
+            finally:
+                self.lock().release()
+
         return {
-            'staged': list(self._load_json(self.staging_file).keys()),
-            'untracked': self._get_untracked_files(),
+            'staged': staged,
+            # Suppressions indexées (présentes dans le commit, plus
+            # dans l'index)
+            'removed': [f for f in head_files if f not in index.entries],
+            'modified': modified,
+            'deleted': deleted,
+            'unchanged': unchanged,
+            'untracked': sorted(
+                f for f in on_disk if f not in index.entries
+            ),
             'head': self._get_head()
         }
 
@@ -129,36 +970,546 @@ class VersionControl:
         """Génère une signature unique (SHA-1) pour le contenu."""
         return hashlib.sha1(content.encode('utf-8')).hexdigest()
 
+    def _object_path(self, file_hash: str) -> str:
+        """Chemin d'un objet : objects/<2 premiers car.>/<reste>."""
+        return os.path.join(self.objects_dir, file_hash[:2], file_hash[2:])
+
+    def _write_object(self, content) -> str:
+        """Stocke un contenu (str ou bytes, compressé zlib) dans objects/
+        et renvoie son hash. Un contenu identique n'est écrit qu'une
+        seule fois."""
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+        file_hash = hashlib.sha1(content).hexdigest()
+        path = self._object_path(file_hash)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            compressed = zlib.compress(content)
+            count('objects_written')
+            count('bytes_written', len(compressed))
+            atomic_write(path, compressed,
+                         self._fsync_policy() == FSYNC_ALL)
+        return file_hash
+
+    def _write_object_from_file(self, path: str) -> str:
+        """
+        Stocke un fichier du disque dans objects/ sans le charger en
+        mémoire : lecture par blocs, hachage SHA-1 et compression zlib
+        au fil de l'eau dans un fichier temporaire, renommé ensuite
+        selon le hash. Fonctionne pour tout fichier, texte ou binaire.
+        """
+        import tempfile  # différé : inutile aux commandes en lecture
+        os.makedirs(self.objects_dir, exist_ok=True)
+        sha = hashlib.sha1()
+        compressor = zlib.compressobj()
+        fd, tmp_path = tempfile.mkstemp(prefix='tmp_', dir=self.objects_dir)
+        try:
+            with os.fdopen(fd, 'wb') as out, open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                    sha.update(chunk)
+                    out.write(compressor.compress(chunk))
+                out.write(compressor.flush())
+                if self._fsync_policy() == FSYNC_ALL:
+                    fsync_file(out)
+                count('files_hashed')
+                count('bytes_read', f.tell())
+            file_hash = sha.hexdigest()
+            final_path = self._object_path(file_hash)
+            if os.path.exists(final_path):
+                os.remove(tmp_path)
+            else:
+                os.makedirs(os.path.dirname(final_path), exist_ok=True)
+                os.replace(tmp_path, final_path)
+                count('objects_written')
+                count('bytes_written', os.path.getsize(final_path))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return file_hash
+
+    def _hash_file(self, path: str) -> str:
+        """SHA-1 d'un fichier du disque, lu par blocs."""
+        sha = hashlib.sha1()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                sha.update(chunk)
+            count('files_hashed')
+            count('bytes_read', f.tell())
+        return sha.hexdigest()
+
+    def _read_object_bytes(self, file_hash: str) -> bytes:
+        """Relit un contenu stocké (objects/ ou pack) à partir de son
+        hash."""
+        path = self._object_path(file_hash)
+        count('objects_read')
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                data = f.read()
+            count('bytes_read', len(data))
+            return zlib.decompress(data)
+        packed = self.packs.read(file_hash)
+        if packed is None:
+            raise RuntimeError(f"Objet {file_hash[:7]} introuvable.")
+        return packed[1]
+
+    def _read_object(self, file_hash: str) -> str:
+        """Relit un contenu texte stocké à partir de son hash."""
+        return self._read_object_bytes(file_hash).decode('utf-8')
+
+    def _copy_object_to(self, data: Dict, dest_path: str):
+        """
+        Écrit le contenu d'une entrée de snapshot dans `dest_path`.
+        Un objet détaché est décompressé par blocs, sans le charger
+        entièrement en mémoire.
+        """
+        path = self._object_path(data['hash'])
+        if 'content' in data or not os.path.exists(path):
+            content = self._blob_bytes(data)
+            with open(dest_path, 'wb') as out:
+                out.write(content)
+            count('bytes_written', len(content))
+            return
+        count('objects_read')
+        decompressor = zlib.decompressobj()
+        with open(path, 'rb') as f, open(dest_path, 'wb') as out:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                out.write(decompressor.decompress(chunk))
+            out.write(decompressor.flush())
+            count('bytes_read', f.tell())
+            count('bytes_written', out.tell())
+
+    def _too_big_to_pack(self, file_hash: str) -> bool:
+        """Vrai pour un objet détaché trop gros pour un pack (les packs
+        sont lus en mémoire)."""
+        path = self._object_path(file_hash)
+        return (os.path.exists(path)
+                and os.path.getsize(path) > PACK_MAX_OBJECT_SIZE)
+
+    def _list_loose_objects(self) -> List[str]:
+        """Hash des objets stockés individuellement dans objects/."""
+        hashes = []
+        if not os.path.exists(self.objects_dir):
+            return hashes
+        for prefix in os.listdir(self.objects_dir):
+            sub_dir = os.path.join(self.objects_dir, prefix)
+            if len(prefix) != 2 or not os.path.isdir(sub_dir):
+                continue
+            for rest in os.listdir(sub_dir):
+                # Fichiers temporaires d'une écriture en cours
+                if not rest.startswith('.'):
+                    hashes.append(prefix + rest)
+        return hashes
+
+    def _load_commit(self, commit_id: str) -> Optional[Dict]:
+        """Charge un commit, qu'il soit détaché (commits/) ou packé."""
+        if not commit_id:
+            return None
+        commit = self.repo.get_commit(commit_id)
+        if commit is not None:
+            return commit
+        commit_path = os.path.join(self.commits_dir, f"{commit_id}.json")
+        if os.path.exists(commit_path):
+            with open(commit_path, 'rb') as f:
+                data = f.read()
+            count('bytes_read', len(data))
+            commit = json.loads(data.decode('utf-8'))
+        else:
+            try:
+                packed = self.packs.read(commit_id)
+            except ValueError:
+                # Identifiant qui n'est pas un hash (ex. nom de branche)
+                return None
+            if packed is None or packed[0] != OBJ_COMMIT:
+                return None
+            commit = json.loads(packed[1].decode('utf-8'))
+        count('commits_loaded')
+        self.repo.put_commit(commit_id, commit)
+        return commit
+
+    def _list_commit_ids(self) -> List[str]:
+        """Identifiants de tous les commits (détachés et packés)."""
+        ids = []
+        if os.path.exists(self.commits_dir):
+            ids = [
+                fname[:-len('.json')]
+                for fname in os.listdir(self.commits_dir)
+                if fname.endswith('.json')
+            ]
+        ids.extend(self.packs.keys(OBJ_COMMIT))
+        return ids
+
+    def _blob_bytes(self, data: Dict) -> bytes:
+        """Contenu brut d'une entrée de snapshot ({'hash': ...}).
+        Les anciens commits stockaient encore le contenu en ligne."""
+        if 'content' in data:
+            return data['content'].encode('utf-8')
+        return self._read_object_bytes(data['hash'])
+
+    def _stored_entry(self, data: Dict) -> Dict:
+        """Entrée de snapshot qui ne référence que objects/ : le contenu
+        en ligne d'un ancien commit y est d'abord écrit."""
+        if 'content' in data:
+            return {'hash': self._write_object(data['content'])}
+        return data
+
+    def _blob_content(self, data: Dict) -> str:
+        """Contenu texte d'une entrée de snapshot (UnicodeDecodeError
+        pour un fichier binaire)."""
+        return self._blob_bytes(data).decode('utf-8')
+
+    def _apply_tree_changes(self, old_files: Dict, new_files: Dict,
+                            jobs: Optional[int] = None
+                            ) -> Tuple[List[str], int]:
+        """
+        Fait passer le répertoire de travail de l'arbre `old_files` à
+        `new_files` en comparant les hash : seuls les chemins modifiés,
+        créés ou supprimés sont touchés.
+        Les écritures passent par un pool borné de `jobs` threads (par
+        défaut : clé 'checkout_jobs' de config.json) ; chaque fichier est
+        écrit de façon atomique (fichier temporaire puis renommage).
+        Renvoie (chemins écrits, nombre de suppressions).
+        """
+        deleted = 0
+        for filename in old_files:
+            if filename in new_files:
+                continue
+            full_path = os.path.join(self.repo_path, filename)
+            if os.path.exists(full_path):
+                os.remove(full_path)
+                deleted += 1
+            # Suppression des répertoires devenus vides
+            parent_dir = os.path.dirname(full_path)
+            while (parent_dir != self.repo_path
+                   and os.path.isdir(parent_dir)
+                   and not os.listdir(parent_dir)):
+                os.rmdir(parent_dir)
+                parent_dir = os.path.dirname(parent_dir)
+
+        written = [
+            filename for filename, data in new_files.items()
+            if old_files.get(filename, {}).get('hash') != data['hash']
+        ]
+        # Répertoires créés en amont : les threads ne font qu'écrire
+        for parent_dir in sorted({os.path.dirname(f) for f in written}):
+            if parent_dir:
+                os.makedirs(os.path.join(self.repo_path, parent_dir),
+                            exist_ok=True)
+
+        if jobs is None:
+            config = self._load_json(self.config_file)
+            jobs = config.get('checkout_jobs', DEFAULT_CHECKOUT_JOBS)
+        if jobs > 1 and len(written) > 1:
+            # Import différé : inutile (et coûteux) au démarrage
+            from concurrent.futures import ThreadPoolExecutor
+            with ThreadPoolExecutor(max_workers=jobs) as pool:
+                list(pool.map(
+                    lambda f: self._write_worktree_file(f, new_files[f]),
+                    written
+                ))
+        else:
+            for filename in written:
+                self._write_worktree_file(filename, new_files[filename])
+        return written, deleted
+
+    def _write_worktree_file(self, filename: str, data: Dict):
+        """Écrit un fichier de travail de façon atomique : un lecteur voit
+        l'ancienne ou la nouvelle version, jamais un fichier tronqué."""
+        full_path = os.path.join(self.repo_path, filename)
+        tmp_path = os.path.join(
+            os.path.dirname(full_path),
+            f".{os.path.basename(full_path)}.mini_vcs_tmp"
+        )
+        try:
+            self._copy_object_to(data, tmp_path)
+            os.replace(tmp_path, full_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _get_ignore_rules(self) -> IgnoreRules:
+        """Règles d'exclusion, compilées une fois par version du fichier
+        .mini_vcsignore."""
+        try:
+            stamp = os.stat(
+                os.path.join(self.repo_path, IGNORE_FILE)
+            ).st_mtime_ns
+        except FileNotFoundError:
+            stamp = None
+        if self._ignore_rules is None or stamp != self._ignore_stamp:
+            self._ignore_rules = IgnoreRules.from_repo(self.repo_path)
+            self._ignore_stamp = stamp
+        return self._ignore_rules
+
+    def _expand_paths(self, files: List[str], index: Index):
+        """
+        Transforme les arguments de `add` en liste (chemin, stat).
+        Un répertoire (ex. '.') est parcouru récursivement ; les fichiers
+        suivis qui y ont disparu sont renvoyés avec un stat None.
+        """
+        paths = []
+        for filename in files:
+            rel = relative_path(self.repo_path, filename)
+            if rel is None:
+                print(f"⚠ Hors du dépôt : {filename}")
+                continue
+            full_path = os.path.join(self.repo_path, rel)
+            if os.path.isdir(full_path):
+                found = self._worktree_files(rel)
+                prefix = f"{rel}/" if rel else ''
+                for name in index.entries:
+                    if name.startswith(prefix) and name not in found:
+                        found[name] = None
+                paths.extend(sorted(found.items()))
+            elif os.path.exists(full_path):
+                paths.append((rel, os.stat(full_path)))
+            else:
+                paths.append((rel, None))
+        return paths
+
     def _get_untracked_files(self) -> List[str]:
         """Liste les fichiers présents mais non suivis par le VCS."""
         if not os.path.exists(self.repo_path):
             return []
-        ignored = {'.mini_vcs', '__pycache__', '.git', '.DS_Store'}
-        files = []
-        for f in os.listdir(self.repo_path):
-            if (f not in ignored and not f.startswith('.')
-                    and os.path.isfile(f)):
-                files.append(f)
-        return files
+        tracked = self._load_index().entries
+        return sorted(
+            rel for rel in self._worktree_files() if rel not in tracked
+        )
+
+    def _worktree_files(self, start: str = '') -> Dict:
+        """
+        Fichiers non ignorés sous `start` : {chemin relatif: stat}.
+        Sans fsmonitor, parcours complet. Avec, l'état précédent est mis
+        à jour pour les seuls chemins signalés ; un débordement de la
+        file inotify ou un changement des règles force un parcours.
+        """
+        rules = self._get_ignore_rules()
+        if self._fsmonitor is None:
+            return dict(walk(self.repo_path, rules, start))
+
+        changes = self._fsmonitor.changes()
+        if (changes is None or self._worktree is None
+                or self._worktree[0] is not rules):
+            self._worktree = (rules, dict(walk(self.repo_path, rules)))
+        else:
+            files = self._worktree[1]
+            for rel in changes:
+                try:
+                    st = os.stat(os.path.join(self.repo_path, rel),
+                                 follow_symlinks=False)
+                except (FileNotFoundError, NotADirectoryError):
+                    st = None
+                if st is not None and stat.S_ISREG(st.st_mode):
+                    name = rel.rsplit('/', 1)[-1]
+                    if not rules.ignored(rel, name, False):
+                        files[rel] = st
+                    continue
+                files.pop(rel, None)
+                if st is None:
+                    # Répertoire supprimé ou déplacé : tout son contenu
+                    prefix = rel + '/'
+                    for name in [f for f in files if f.startswith(prefix)]:
+                        del files[name]
+        files = self._worktree[1]
+        if not start:
+            return dict(files)
+        prefix = start + '/'
+        return {rel: st for rel, st in files.items()
+                if rel.startswith(prefix)}
 
     def _load_json(self, path: str) -> Dict:
-        if os.path.exists(path):
-            try:
-                with open(path, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except json.JSONDecodeError:
-                return {}
-        return {}
+        """Contenu d'un fichier JSON du dépôt ({} s'il n'existe pas ;
+        RuntimeError s'il est corrompu)."""
+        return self.repo.load_json(path)
 
     def _save_json(self, path: str, data: Dict):
-        with open(path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2)
+        self.repo.save_json(path, data,
+                            self._fsync_policy() != FSYNC_NONE)
+
+    def _fsync_policy(self) -> str:
+        """Politique fsync du dépôt (clé 'fsync' de config.json)."""
+        if not os.path.exists(self.config_file):
+            return DEFAULT_FSYNC
+        return self.repo.load_json(self.config_file).get('fsync',
+                                                         DEFAULT_FSYNC)
 
     def _get_head(self) -> str:
         """Récupère le nom de la branche courante (HEAD)."""
         config = self._load_json(self.config_file)
         return config.get('head', 'main')
 
+    def _write_commit(self, msg: str, files: Dict,
+                      parents: List[str]) -> str:
+        """Enregistre un objet commit et l'ajoute au commit-graph."""
+        now = datetime.now()
+        commit_id = self._compute_hash(msg + now.isoformat())
+
+        commit_data = {
+            'id': commit_id,
+            'message': msg,
+            'date': now.isoformat(),
+            # Snapshot : uniquement les références vers objects/
+            'files': files,
+            # Identifiants réels des parents (deux pour un merge)
+            'parents': parents,
+            'parent': parents[0] if parents else None
+        }
+
+        # Le graphe d'un ancien dépôt est construit avant d'y ajouter
+        # ce commit
+        self._ensure_commit_graph()
+
+        # Le commit est en place avant que le graphe, puis la branche,
+        # ne le référencent
+        fsync = self._fsync_policy() != FSYNC_NONE
+        commit_path = os.path.join(self.commits_dir, f"{commit_id}.json")
+        encoded = json.dumps(commit_data, indent=2).encode('utf-8')
+        count('commits_written')
+        count('bytes_written', len(encoded))
+        atomic_write(commit_path, encoded, fsync)
+        self.repo.put_commit(commit_id, commit_data)
+
+        # Ajout incrémental au commit-graph (log/graph le lisent seul)
+        self.graph.append(commit_id, parents, now, msg, fsync)
+        return commit_id
+
+    def _load_index(self) -> Index:
+        """
+        Charge l'index. Un dépôt qui n'en a pas encore part de l'arbre
+        du commit courant et de l'ancien staging.json.
+        """
+        index = Index(self.index_file,
+                      fsync=self._fsync_policy() != FSYNC_NONE)
+        if index.exists():
+            return self.repo.load_index(index)
+        head_data = self._load_commit(self._get_head_commit()) or {}
+        for name, data in head_data.get('files', {}).items():
+            index.set(name, self._stored_entry(data)['hash'])
+        for name, data in self._load_json(self.staging_file).items():
+            if 'content' in data:
+                index.set(name, self._write_object(data['content']))
+            else:
+                index.set(name, data['hash'])
+        return index
+
+    def _index_stamp(self) -> Tuple:
+        """Stat de l'index et de son journal."""
+        return (Repository._stamp(self.index_file),
+                Repository._stamp(self.index_file + '.journal'))
+
+    def _save_index(self, index: Index):
+        index.save()
+        if os.path.exists(self.staging_file):
+            os.remove(self.staging_file)
+
+    def _carry_staged(self, base: Dict, target: Dict) -> List[str]:
+        """
+        Chemins dont l'index diffère de l'arbre `base` (modifications
+        indexées, ajouts et suppressions compris), à conserver lors du
+        passage de `base` à `target`. ValueError si `target` modifie
+        l'un d'eux autrement : l'indexé serait perdu.
+        """
+        index = self._load_index()
+
+        def staged_hash(name: str) -> Optional[str]:
+            entry = index.entries.get(name)
+            return entry.hash if entry is not None else None
+
+        staged = [name for name in set(index.entries) | set(base)
+                  if staged_hash(name) != base.get(name, {}).get('hash')]
+        clash = sorted(
+            name for name in staged
+            if target.get(name, {}).get('hash')
+            not in (base.get(name, {}).get('hash'), staged_hash(name))
+        )
+        if clash:
+            raise ValueError("Modifications indexées écrasées : "
+                             + ", ".join(clash)
+                             + " (commitez-les d'abord)")
+        return staged
+
+    def _check_worktree(self, old_files: Dict, new_files: Dict):
+        """
+        Refuse (ValueError) un passage de `old_files` à `new_files` qui
+        supprimerait ou écraserait un fichier modifié sur le disque :
+        chaque chemin touché doit contenir la version de l'index, de
+        l'arbre quitté ou déjà celle de la cible. Le stat est comparé à
+        l'index avant tout hachage.
+        """
+        index = self._load_index()
+        dirty = []
+        for name in sorted(set(old_files) | set(new_files)):
+            old_hash = old_files.get(name, {}).get('hash')
+            new_hash = new_files.get(name, {}).get('hash')
+            if old_hash == new_hash:
+                continue
+            path = os.path.join(self.repo_path, name)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entry = index.entries.get(name)
+            if not stat.S_ISREG(st.st_mode):
+                dirty.append(name)
+                continue
+            if entry is not None and index.stat_matches(entry, st):
+                # Version indexée : protégée par _carry_staged
+                continue
+            expected = {old_hash, new_hash,
+                        entry.hash if entry is not None else None}
+            if self._hash_file(path) not in expected - {None}:
+                dirty.append(name)
+        if dirty:
+            raise ValueError("Modifications locales écrasées : "
+                             + ", ".join(dirty)
+                             + " (commitez-les ou indexez-les d'abord)")
+
+    def _update_index(self, tree: Dict, written: List[str],
+                      keep: Optional[List[str]] = None):
+        """
+        Aligne l'index sur l'arbre `tree` après une écriture du
+        répertoire de travail. Les fichiers `written` viennent d'être
+        écrits : leur stat est relevé. Les autres gardent leur entrée si
+        le hash est inchangé, sinon ils seront rehachés au status.
+        Les chemins `keep` (voir _carry_staged) gardent leur entrée
+        actuelle, ou leur absence.
+        """
+        index = self._load_index()
+        fresh = set(written)
+        kept = set(keep or ())
+        entries = {name: index.entries[name] for name in kept
+                   if name in index.entries}
+        for name, data in tree.items():
+            if name in kept:
+                continue
+            # Le prochain commit ne doit référencer que des objets
+            # présents
+            data = self._stored_entry(data)
+            old = index.entries.get(name)
+            if name in fresh:
+                path = os.path.join(self.repo_path, name)
+                index.set(name, data['hash'], os.stat(path))
+            elif old is None or old.hash != data['hash']:
+                index.set(name, data['hash'])
+            entries[name] = index.entries[name]
+        index.entries = entries
+        self._save_index(index)
+
+    def _get_head_commit(self) -> Optional[str]:
+        """Commit pointé par la branche courante (None si vide)."""
+        refs = self._load_json(self.refs_file)
+        return refs.get(self._get_head())
+
+    def _ensure_commit_graph(self):
+        """Construit le commit-graph d'un dépôt qui n'en a pas encore."""
+        if self.graph.exists():
+            return
+        commit_ids = self._list_commit_ids()
+        if commit_ids:
+            self.graph.rebuild([self._load_commit(c) for c in commit_ids])
+            self.bitmaps.clear()
+
     def _update_head_ref(self, branch_name: str):
         """Met à jour le fichier config pour pointer vers une nouvelle
         branche."""
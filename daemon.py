@@ -0,0 +1,228 @@
+# daemon.py
+import os
+import sys
+import time
+
+# Ce module est importé par chaque commande unique : pas de json ni de
+# typing (plusieurs ms de chargement), le protocole est en texte brut ;
+# socket n'est importé que si un démon peut répondre.
+SOCKET_NAME = 'daemon.sock'
+# Commandes servies par le démon (init crée le dépôt : toujours locale)
+DAEMON_COMMANDS = (
+    'add', 'commit', 'status', 'log', 'graph', 'branch', 'merge', 'repack',
+    'gc', 'fsck', 'stats', 'diff', 'blame', 'annotate',
+)
+# Attente du socket au démarrage du démon (secondes)
+START_TIMEOUT = 5.0
+
+
+def socket_path(repo_path: str = '.') -> str:
+    return os.path.join(os.path.abspath(repo_path), '.mini_vcs', SOCKET_NAME)
+
+
+def available() -> bool:
+    """Les sockets Unix n'existent pas partout (anciens Windows)."""
+    import socket
+    return hasattr(socket, 'AF_UNIX')
+
+
+def call(argv: list, repo_path: str = '.', color: bool = False):
+    """
+    Client léger : envoie une commande au démon du dépôt et renvoie
+    (sortie, code de sortie), ou None s'il n'y a pas de démon actif
+    (l'appelant exécute alors la commande lui-même).
+    Le coût d'un appel se limite à l'aller-retour sur le socket.
+    """
+    path = socket_path(repo_path)
+    # Pas de socket, pas de démon : rien d'autre n'est chargé
+    if not os.path.exists(path) or not available():
+        return None
+    import socket
+    request = _encode_request(argv, color)
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(path)
+            sock.sendall(request)
+            data = b''.join(iter(lambda: sock.recv(65536), b''))
+    except (ConnectionRefusedError, FileNotFoundError):
+        # Socket laissé par un démon arrêté brutalement
+        return None
+    if not data:
+        return None
+    status, _, output = data.decode('utf-8').partition('\n')
+    return output, int(status)
+
+
+def _encode_request(argv: list, color: bool) -> bytes:
+    """Requête : 'color' ou 'plain', puis les arguments, séparés par
+    des NUL, sur une ligne."""
+    fields = ['color' if color else 'plain'] + list(argv)
+    return ('\0'.join(fields) + '\n').encode('utf-8')
+
+
+def _decode_request(line: bytes):
+    fields = line.decode('utf-8').rstrip('\n').split('\0')
+    return fields[1:], fields[0] == 'color'
+
+
+class DaemonServer:
+    """
+    Serveur asyncio sur un socket Unix (.mini_vcs/daemon.sock).
+    Une seule session VCSCommands reste en mémoire pendant toute la vie
+    du démon : config, refs, index, commits et commit-graph sont déjà
+    chargés quand une requête arrive (les caches se revalident sur le
+    stat des fichiers, les écritures d'autres processus sont donc vues).
+
+    Protocole : une requête par connexion (voir `_encode_request`) ;
+    réponse : le code de sortie sur la première ligne, puis la sortie
+    de la commande, et fermeture. Les commandes sont exécutées une à
+    une.
+    """
+
+    def __init__(self, repo_path: str = '.'):
+        # Les chemins des commandes (add) sont relatifs à la racine
+        os.chdir(repo_path)
+        from commands import VCSCommands
+        self.commands = VCSCommands()
+        # Opt-in (config 'fsmonitor') : status proportionnel aux
+        # changements
+        self.commands.vcs.start_fsmonitor()
+        self.path = socket_path('.')
+        self._stop = None
+        self._busy = None
+
+    def _execute(self, argv: list, color: bool):
+        """Exécute une commande et renvoie (sortie, code de sortie)."""
+        import io
+        import contextlib
+        import colors
+
+        if not argv or argv[0] not in DAEMON_COMMANDS:
+            return (f"❌ Commande non servie par le démon : "
+                    f"{' '.join(argv)}\n", 2)
+        if argv[0] == 'merge' and '--no-interactive' not in argv:
+            # Pas de terminal côté démon pour répondre aux questions
+            argv = argv + ['--no-interactive']
+
+        colors.set_enabled(color)
+        self.commands.exit_code = 0
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            # Mesures gardées par le démon : `stats` les renvoie
+            self.commands._begin_command(' '.join(argv))
+            try:
+                getattr(self.commands, f"do_{argv[0]}")(' '.join(argv[1:]))
+            except Exception as e:
+                self.commands._error(f"Erreur: {e}")
+            finally:
+                self.commands._end_command()
+        return out.getvalue(), self.commands.exit_code
+
+    async def _handle(self, reader, writer):
+        try:
+            argv, color = _decode_request(await reader.readline())
+            if argv == ['shutdown']:
+                output, exit_code = "🛑 Démon arrêté.\n", 0
+                self._stop.set()
+            elif argv == ['ping']:
+                output = f"✅ Démon actif (pid {os.getpid()}).\n"
+                exit_code = 0
+            else:
+                async with self._busy:
+                    output, exit_code = self._execute(argv, color)
+            writer.write(f"{exit_code}\n{output}".encode('utf-8'))
+            await writer.drain()
+        except (UnicodeDecodeError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self):
+        import asyncio
+        import signal
+
+        self._stop = asyncio.Event()
+        self._busy = asyncio.Lock()
+        if os.path.exists(self.path):
+            if call(['ping']) is not None:
+                raise RuntimeError(
+                    "Un démon est déjà actif pour ce dépôt."
+                )
+            os.remove(self.path)
+
+        server = await asyncio.start_unix_server(self._handle, path=self.path)
+        # Accès réservé à l'utilisateur courant
+        os.chmod(self.path, 0o600)
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, self._stop.set)
+        print(f"✅ Démon à l'écoute sur {self.path}")
+        try:
+            async with server:
+                await self._stop.wait()
+        finally:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+
+def _spawn_command() -> list:
+    """Commande qui relance ce programme en mode `daemon run`."""
+    if getattr(sys, 'frozen', False):
+        # Exécutable PyInstaller
+        return [sys.executable, 'daemon', 'run']
+    main_py = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           'main.py')
+    return [sys.executable, main_py, 'daemon', 'run']
+
+
+def main(args: list) -> int:
+    """daemon start | stop | status | run (premier plan)."""
+    usage = "Usage: daemon start|stop|status|run"
+    if not available():
+        print("❌ Sockets Unix indisponibles sur ce système.")
+        return 1
+    if not os.path.isdir('.mini_vcs'):
+        print("❌ Dépôt non initialisé. Lancez 'init' d'abord.")
+        return 1
+    action = args[0] if args else ''
+
+    if action == 'run':
+        import asyncio
+        try:
+            asyncio.run(DaemonServer('.').serve())
+        except RuntimeError as e:
+            print(f"❌ {e}")
+            return 1
+        return 0
+
+    if action == 'start':
+        if call(['ping']) is not None:
+            print("⚠ Démon déjà actif.")
+            return 0
+        import subprocess
+        process = subprocess.Popen(
+            _spawn_command(), stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            start_new_session=True
+        )
+        deadline = time.monotonic() + START_TIMEOUT
+        while time.monotonic() < deadline:
+            if call(['ping']) is not None:
+                print(f"✅ Démon démarré (pid {process.pid}).")
+                return 0
+            if process.poll() is not None:
+                break
+            time.sleep(0.05)
+        print("❌ Le démon n'a pas démarré.")
+        return 1
+
+    if action in ('stop', 'status'):
+        reply = call(['shutdown' if action == 'stop' else 'ping'])
+        if reply is None:
+            print("Aucun démon actif.")
+            return 0 if action == 'stop' else 1
+        sys.stdout.write(reply[0])
+        return reply[1]
+
+    print(usage)
+    return 1
@@ -0,0 +1,267 @@
+# diff.py
+from typing import Iterator, List, Sequence, Tuple
+
+# Bloc commun : (début dans a, début dans b, longueur)
+Block = Tuple[int, int, int]
+# Modification : a[début:fin] remplacé par b[début:fin]
+Change = Tuple[int, int, int, int]
+
+NO_NEWLINE = "\\ No newline at end of file\n"
+
+
+def _middle_snake(a: Sequence[int], a0: int, a1: int,
+                  b: Sequence[int], b0: int, b1: int):
+    """
+    Cherche le « serpent du milieu » (Myers 1986, section 4b) :
+    parcours simultané depuis le début et depuis la fin jusqu'à ce que
+    les deux chemins se rejoignent. Mémoire O(N + M).
+    Renvoie (x, y, u, v) : le serpent va de (x, y) à (u, v).
+    """
+    n = a1 - a0
+    m = b1 - b0
+    delta = n - m
+    odd = delta & 1
+    max_d = (n + m + 1) // 2
+    offset = max_d + 1
+    vf = [0] * (2 * offset + 1)
+    vb = [0] * (2 * offset + 1)
+
+    for d in range(max_d + 1):
+        # Chemin avant
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and vf[offset + k - 1] < vf[offset + k + 1]):
+                x = vf[offset + k + 1]
+            else:
+                x = vf[offset + k - 1] + 1
+            y = x - k
+            x_start, y_start = x, y
+            while x < n and y < m and a[a0 + x] == b[b0 + y]:
+                x += 1
+                y += 1
+            vf[offset + k] = x
+            c = delta - k
+            if odd and -(d - 1) <= c <= d - 1:
+                if x + vb[offset + c] >= n:
+                    return x_start, y_start, x, y
+
+        # Chemin arrière (coordonnées comptées depuis la fin)
+        for c in range(-d, d + 1, 2):
+            if c == -d or (c != d and vb[offset + c - 1] < vb[offset + c + 1]):
+                x = vb[offset + c + 1]
+            else:
+                x = vb[offset + c - 1] + 1
+            y = x - c
+            x_start, y_start = x, y
+            while (x < n and y < m
+                   and a[a1 - 1 - x] == b[b1 - 1 - y]):
+                x += 1
+                y += 1
+            vb[offset + c] = x
+            k = delta - c
+            if not odd and -d <= k <= d:
+                if x + vf[offset + k] >= n:
+                    return n - x, m - y, n - x_start, m - y_start
+    raise AssertionError("Serpent du milieu introuvable.")
+
+
+def _diff_blocks(a: Sequence[int], a0: int, a1: int,
+                 b: Sequence[int], b0: int, b1: int,
+                 out: List[Block]):
+    """Ajoute à `out` les blocs communs de a[a0:a1] et b[b0:b1]."""
+    while True:
+        # Préfixe commun
+        start_a, start_b = a0, b0
+        while a0 < a1 and b0 < b1 and a[a0] == b[b0]:
+            a0 += 1
+            b0 += 1
+        if a0 > start_a:
+            out.append((start_a, start_b, a0 - start_a))
+        # Suffixe commun (ajouté après la partie centrale)
+        end_a = a1
+        while a1 > a0 and b1 > b0 and a[a1 - 1] == b[b1 - 1]:
+            a1 -= 1
+            b1 -= 1
+        suffix = (a1, b1, end_a - a1) if a1 < end_a else None
+
+        if a0 < a1 and b0 < b1:
+            x, y, u, v = _middle_snake(a, a0, a1, b, b0, b1)
+            _diff_blocks(a, a0, a0 + x, b, b0, b0 + y, out)
+            if u > x:
+                out.append((a0 + x, b0 + y, u - x))
+            # La seconde moitié est traitée par la boucle (pas de
+            # récursion supplémentaire)
+            a0, b0 = a0 + u, b0 + v
+            if suffix:
+                _diff_blocks(a, a0, a1, b, b0, b1, out)
+                out.append(suffix)
+                return
+            continue
+
+        if suffix:
+            out.append(suffix)
+        return
+
+
+def matching_blocks(a: Sequence[str], b: Sequence[str]) -> List[Block]:
+    """
+    Blocs de lignes communs à `a` et `b` (plus longue sous-séquence
+    commune, algorithme O(ND) de Myers en espace linéaire).
+    La liste se termine par le bloc sentinelle (len(a), len(b), 0).
+    """
+    # Les lignes sont remplacées par des entiers : comparaisons rapides
+    ids = {}
+    a_ids = [ids.setdefault(line, len(ids)) for line in a]
+    b_ids = [ids.setdefault(line, len(ids)) for line in b]
+
+    raw: List[Block] = []
+    _diff_blocks(a_ids, 0, len(a_ids), b_ids, 0, len(b_ids), raw)
+
+    # Fusion des blocs contigus
+    blocks: List[Block] = []
+    for i, j, n in raw:
+        if n == 0:
+            continue
+        if blocks:
+            pi, pj, pn = blocks[-1]
+            if pi + pn == i and pj + pn == j:
+                blocks[-1] = (pi, pj, pn + n)
+                continue
+        blocks.append((i, j, n))
+    blocks.append((len(a), len(b), 0))
+    return blocks
+
+
+def changes(a: Sequence[str], b: Sequence[str]) -> List[Change]:
+    """Régions modifiées entre deux blocs communs : (a_début, a_fin,
+    b_début, b_fin)."""
+    result = []
+    i = j = 0
+    for block_a, block_b, size in matching_blocks(a, b):
+        if i < block_a or j < block_b:
+            result.append((i, block_a, j, block_b))
+        i, j = block_a + size, block_b + size
+    return result
+
+
+def _hunk_range(start: int, stop: int) -> str:
+    """Plage d'un en-tête @@ (numéros à partir de 1, format de diff -u)."""
+    length = stop - start
+    if length == 1:
+        return str(start + 1)
+    # Plage vide : la ligne qui précède
+    return f"{start + 1 if length else start},{length}"
+
+
+def _prefixed(prefix: str, lines: Sequence[str]) -> Iterator[str]:
+    for line in lines:
+        if line.endswith('\n'):
+            yield prefix + line
+        else:
+            yield prefix + line + '\n'
+            yield NO_NEWLINE
+
+
+def unified_hunks(a: Sequence[str], b: Sequence[str],
+                  context: int = 3) -> Iterator[str]:
+    """
+    Blocs @@ d'un diff unifié de `a` vers `b` (lignes avec leur fin de
+    ligne), sans les en-têtes ---/+++. Deux modifications séparées de
+    moins de 2 * `context` lignes communes partagent un bloc.
+    """
+    groups: List[List[Change]] = []
+    for change in changes(a, b):
+        if groups and change[0] - groups[-1][-1][1] <= 2 * context:
+            groups[-1].append(change)
+        else:
+            groups.append([change])
+
+    for group in groups:
+        # Les lignes communes autour d'un bloc ont la même longueur
+        # dans a et dans b
+        start_a = max(0, group[0][0] - context)
+        start_b = group[0][2] - (group[0][0] - start_a)
+        end_a = min(len(a), group[-1][1] + context)
+        end_b = group[-1][3] + (end_a - group[-1][1])
+        yield (f"@@ -{_hunk_range(start_a, end_a)} "
+               f"+{_hunk_range(start_b, end_b)} @@\n")
+        position = start_a
+        for a_start, a_end, b_start, b_end in group:
+            yield from _prefixed(' ', a[position:a_start])
+            yield from _prefixed('-', a[a_start:a_end])
+            yield from _prefixed('+', b[b_start:b_end])
+            position = a_end
+        yield from _prefixed(' ', a[position:end_a])
+
+
+def _sync_regions(base: Sequence[str], ours: Sequence[str],
+                  theirs: Sequence[str]):
+    """
+    Régions de la base restées identiques dans les deux versions.
+    Renvoie des tuples (base_début, base_fin, ours_début, ours_fin,
+    theirs_début, theirs_fin), terminés par une région vide en fin.
+    """
+    ours_blocks = matching_blocks(base, ours)
+    theirs_blocks = matching_blocks(base, theirs)
+    regions = []
+    i = j = 0
+    while i < len(ours_blocks) - 1 and j < len(theirs_blocks) - 1:
+        o_base, o_start, o_len = ours_blocks[i]
+        t_base, t_start, t_len = theirs_blocks[j]
+        low = max(o_base, t_base)
+        high = min(o_base + o_len, t_base + t_len)
+        if low < high:
+            o_sub = o_start + (low - o_base)
+            t_sub = t_start + (low - t_base)
+            regions.append((low, high, o_sub, o_sub + high - low,
+                            t_sub, t_sub + high - low))
+        if o_base + o_len < t_base + t_len:
+            i += 1
+        else:
+            j += 1
+    regions.append((len(base), len(base), len(ours), len(ours),
+                    len(theirs), len(theirs)))
+    return regions
+
+
+def merge3(base: Sequence[str], ours: Sequence[str],
+           theirs: Sequence[str], ours_label: str = 'ours',
+           theirs_label: str = 'theirs') -> Tuple[List[str], int]:
+    """
+    Fusion à trois voies ligne par ligne.
+    Les modifications qui ne se chevauchent pas sont combinées ;
+    les chevauchements réels sont encadrés de marqueurs de conflit.
+    Renvoie (lignes fusionnées, nombre de conflits).
+    """
+    result: List[str] = []
+    conflicts = 0
+    pos_base = pos_ours = pos_theirs = 0
+
+    for (base_start, base_end, ours_start, ours_end,
+         theirs_start, theirs_end) in _sync_regions(base, ours, theirs):
+        base_chunk = list(base[pos_base:base_start])
+        ours_chunk = list(ours[pos_ours:ours_start])
+        theirs_chunk = list(theirs[pos_theirs:theirs_start])
+
+        if ours_chunk == theirs_chunk or theirs_chunk == base_chunk:
+            result.extend(ours_chunk)
+        elif ours_chunk == base_chunk:
+            result.extend(theirs_chunk)
+        else:
+            conflicts += 1
+            result.append(f"<<<<<<< {ours_label}\n")
+            result.extend(_terminated(ours_chunk))
+            result.append("=======\n")
+            result.extend(_terminated(theirs_chunk))
+            result.append(f">>>>>>> {theirs_label}\n")
+
+        result.extend(base[base_start:base_end])
+        pos_base, pos_ours, pos_theirs = base_end, ours_end, theirs_end
+
+    return result, conflicts
+
+
+def _terminated(lines: List[str]) -> List[str]:
+    """Garantit un saut de ligne final avant un marqueur de conflit."""
+    if lines and not lines[-1].endswith('\n'):
+        return lines[:-1] + [lines[-1] + '\n']
+    return lines
@@ -0,0 +1,129 @@
+# fsck.py
+import os
+import json
+import zlib
+import struct
+import hashlib
+from typing import List, Tuple
+
+from storage import Pack, OBJ_BLOB, OBJ_COMMIT
+
+# Objets vérifiés par tâche envoyée à un processus
+BATCH_SIZE = 256
+
+# Tâche : (type, emplacement, éléments)
+#   ('loose', objects_dir, [hash...])
+#   ('commit', commits_dir, [id...])
+#   ('pack', idx_path, (début, fin))  -- tranche d'enregistrements
+Task = Tuple[str, str, object]
+
+
+def commit_hash(commit: dict) -> str:
+    """Identifiant attendu d'un commit (voir VersionControl._write_commit)."""
+    text = commit.get('message', '') + commit.get('date', '')
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def check_commit(key: str, data: bytes) -> List[str]:
+    try:
+        commit = json.loads(data.decode('utf-8'))
+    except (UnicodeDecodeError, ValueError):
+        return [f"commit {key[:7]} : JSON illisible"]
+    problems = []
+    if commit.get('id') != key:
+        problems.append(f"commit {key[:7]} : champ id différent "
+                        f"({str(commit.get('id'))[:7]})")
+    # Les anciens commits (sans 'parents') ont haché une autre lecture
+    # de l'horloge que leur 'date' : identifiant invérifiable
+    if 'parents' in commit and commit_hash(commit) != key:
+        problems.append(f"commit {key[:7]} : hash invalide")
+    return problems
+
+
+def check_blob(key: str, data: bytes) -> List[str]:
+    if hashlib.sha1(data).hexdigest() != key:
+        return [f"objet {key[:7]} : hash invalide"]
+    return []
+
+
+def _check_loose(objects_dir: str, hashes: List[str]) -> List[str]:
+    problems = []
+    for key in hashes:
+        path = os.path.join(objects_dir, key[:2], key[2:])
+        try:
+            # Lecture par blocs : les gros objets restent détachés
+            sha = hashlib.sha1()
+            decompressor = zlib.decompressobj()
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    sha.update(decompressor.decompress(chunk))
+                sha.update(decompressor.flush())
+        except (OSError, zlib.error) as e:
+            problems.append(f"objet {key[:7]} : illisible ({e})")
+            continue
+        if sha.hexdigest() != key:
+            problems.append(f"objet {key[:7]} : hash invalide")
+    return problems
+
+
+def _check_commits(commits_dir: str, ids: List[str]) -> List[str]:
+    problems = []
+    for key in ids:
+        try:
+            with open(os.path.join(commits_dir, f"{key}.json"), 'rb') as f:
+                data = f.read()
+        except OSError as e:
+            problems.append(f"commit {key[:7]} : illisible ({e})")
+            continue
+        problems.extend(check_commit(key, data))
+    return problems
+
+
+def _check_pack(idx_path: str, start: int, stop: int) -> List[str]:
+    problems = []
+    pack = Pack(idx_path)
+    name = os.path.basename(pack.pack_path)
+    try:
+        for i in range(start, stop):
+            key, obj_type, offset = pack.entry(i)
+            try:
+                data = pack.read_at(offset)
+            except (OSError, ValueError, struct.error, zlib.error) as e:
+                problems.append(f"objet {key[:7]} ({name}) : illisible "
+                                f"({e})")
+                continue
+            if obj_type == OBJ_COMMIT:
+                problems.extend(check_commit(key, data))
+            elif obj_type == OBJ_BLOB:
+                problems.extend(check_blob(key, data))
+            else:
+                problems.append(f"objet {key[:7]} : type {obj_type} "
+                                "inconnu")
+    finally:
+        pack.close()
+    return problems
+
+
+def verify(task: Task) -> List[str]:
+    """
+    Vérifie un lot d'objets et renvoie les problèmes trouvés.
+    Fonction de module : exécutée dans un processus du pool, elle ne
+    reçoit que des chemins et relit elle-même les fichiers.
+    """
+    kind, location, items = task
+    if kind == 'loose':
+        return _check_loose(location, items)
+    if kind == 'commit':
+        return _check_commits(location, items)
+    return _check_pack(location, *items)
+
+
+def batches(kind: str, location: str, keys: List[str]) -> List[Task]:
+    return [(kind, location, keys[i:i + BATCH_SIZE])
+            for i in range(0, len(keys), BATCH_SIZE)]
+
+
+def pack_batches(pack: Pack) -> List[Task]:
+    return [(
+        'pack', pack.idx_path, (i, min(i + BATCH_SIZE, pack.count))
+    ) for i in range(0, pack.count, BATCH_SIZE)]
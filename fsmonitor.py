@@ -0,0 +1,204 @@
+# fsmonitor.py
+import os
+import sys
+import errno
+import struct
+import ctypes
+import ctypes.util
+from typing import Dict, Optional, Set
+
+from worktree import IGNORE_FILE, IgnoreRules
+
+# Constantes de <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM
+              | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+              | IN_MOVE_SELF | IN_ONLYDIR)
+
+# struct inotify_event : wd, mask, cookie, len, puis le nom (len octets)
+EVENT = struct.Struct('iIII')
+READ_SIZE = 64 * 1024
+
+_libc = None
+
+
+def _load_libc():
+    global _libc
+    if _libc is None:
+        _libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6',
+                            use_errno=True)
+        _libc.inotify_init1.argtypes = [ctypes.c_int]
+        _libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p,
+                                            ctypes.c_uint32]
+    return _libc
+
+
+def supported() -> bool:
+    """inotify n'existe que sous Linux."""
+    if not sys.platform.startswith('linux'):
+        return False
+    try:
+        return hasattr(_load_libc(), 'inotify_init1')
+    except OSError:
+        return False
+
+
+class FSMonitor:
+    """
+    Surveillance du répertoire de travail par inotify (via ctypes).
+    Chaque répertoire non ignoré reçoit une surveillance ; les chemins
+    touchés depuis la dernière requête sont accumulés et rendus par
+    `changes()`. Quand la file du noyau a débordé, ou que la
+    surveillance est impossible, `changes()` renvoie None : l'appelant
+    refait alors un parcours complet.
+    """
+
+    def __init__(self, repo_path: str, rules: IgnoreRules):
+        self.repo_path = repo_path
+        self.rules = rules
+        self.fd = -1
+        # descripteur de surveillance -> répertoire relatif ('' = racine)
+        self._dirs: Dict[int, str] = {}
+        self._dirty: Set[str] = set()
+        # Vrai si des événements ont pu être perdus
+        self._overflow = True
+
+    def start(self) -> bool:
+        """Installe les surveillances ; False si inotify est indisponible
+        ou si la limite du noyau (max_user_watches) est atteinte."""
+        if not supported():
+            return False
+        fd = _load_libc().inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            return False
+        self.fd = fd
+        if not self._watch_tree(''):
+            self.close()
+            return False
+        # Tout ce qui précède le démarrage est inconnu : premier appel à
+        # changes() = parcours complet
+        self._dirty.clear()
+        self._overflow = True
+        return True
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+        self.fd = -1
+        self._dirs.clear()
+
+    @property
+    def active(self) -> bool:
+        return self.fd >= 0
+
+    def _add_watch(self, rel_dir: str) -> bool:
+        path = os.path.join(self.repo_path, rel_dir)
+        wd = _load_libc().inotify_add_watch(self.fd, os.fsencode(path),
+                                            WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            # Répertoire déjà supprimé : sans importance
+            return err in (errno.ENOENT, errno.ENOTDIR)
+        self._dirs[wd] = rel_dir
+        return True
+
+    def _watch_tree(self, rel_dir: str) -> bool:
+        """Surveille `rel_dir` et ses sous-répertoires non ignorés ;
+        les fichiers trouvés sont marqués modifiés."""
+        stack = [rel_dir]
+        while stack:
+            current = stack.pop()
+            if not self._add_watch(current):
+                return False
+            try:
+                iterator = os.scandir(os.path.join(self.repo_path, current))
+            except (FileNotFoundError, NotADirectoryError, PermissionError):
+                continue
+            with iterator:
+                for entry in iterator:
+                    rel = f"{current}/{entry.name}" if current else entry.name
+                    if entry.is_dir(follow_symlinks=False):
+                        if not self.rules.ignored(rel, entry.name, True):
+                            stack.append(rel)
+                    else:
+                        self._dirty.add(rel)
+        return True
+
+    def _read_events(self):
+        """Vide la file d'événements du noyau (lecture non bloquante)."""
+        while True:
+            try:
+                data = os.read(self.fd, READ_SIZE)
+            except BlockingIOError:
+                return
+            pos = 0
+            while pos + EVENT.size <= len(data):
+                wd, mask, _cookie, length = EVENT.unpack_from(data, pos)
+                pos += EVENT.size
+                name = os.fsdecode(data[pos:pos + length].rstrip(b'\0'))
+                pos += length
+                self._handle(wd, mask, name)
+
+    def _handle(self, wd: int, mask: int, name: str):
+        if mask & IN_Q_OVERFLOW:
+            self._overflow = True
+            return
+        if mask & IN_IGNORED:
+            # Surveillance retirée par le noyau (répertoire supprimé)
+            self._dirs.pop(wd, None)
+            return
+        rel_dir = self._dirs.get(wd)
+        if rel_dir is None:
+            return
+        if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+            if rel_dir:
+                self._dirty.add(rel_dir)
+            else:
+                # Racine du dépôt déplacée ou supprimée
+                self._overflow = True
+            return
+        if not name:
+            return
+        rel = f"{rel_dir}/{name}" if rel_dir else name
+        if rel == IGNORE_FILE:
+            # Nouvelles règles : parcours complet
+            self.rules = IgnoreRules.from_repo(self.repo_path)
+            self._overflow = True
+            return
+        self._dirty.add(rel)
+        if (mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO)
+                and not self.rules.ignored(rel, name, True)):
+            if not self._watch_tree(rel):
+                # Limite de surveillances atteinte
+                self.close()
+
+    def changes(self) -> Optional[Set[str]]:
+        """
+        Chemins relatifs (fichiers ou répertoires) créés, modifiés ou
+        supprimés depuis l'appel précédent, ou None si un parcours
+        complet est nécessaire.
+        """
+        if not self.active:
+            return None
+        self._read_events()
+        if not self.active or self._overflow:
+            self._overflow = False
+            self._dirty.clear()
+            return None
+        dirty, self._dirty = self._dirty, set()
+        return dirty
@@ -0,0 +1,168 @@
+# fsutil.py
+import os
+import time
+import functools
+
+# Politique fsync (clé 'fsync' de config.json) :
+#   'metadata' : config, refs, index, commits, commit-graph et packs
+#   'all'      : en plus, chaque objet de objects/
+#   'none'     : aucun fsync (le renommage reste atomique)
+FSYNC_NONE = 'none'
+FSYNC_METADATA = 'metadata'
+FSYNC_ALL = 'all'
+DEFAULT_FSYNC = FSYNC_METADATA
+
+LOCK_NAME = 'lock'
+# Attente maximale d'un verrou tenu par un autre processus (secondes)
+LOCK_TIMEOUT = 10.0
+LOCK_POLL = 0.05
+
+
+def fsync_file(f):
+    """Force l'écriture sur disque d'un fichier ouvert."""
+    f.flush()
+    os.fsync(f.fileno())
+
+
+def fsync_dir(directory: str):
+    """Rend durable un renommage dans `directory` (sans effet là où
+    un répertoire ne peut pas être ouvert, ex. Windows)."""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def atomic_write(path: str, data: bytes, fsync: bool = True):
+    """
+    Remplace `path` par `data` via un fichier temporaire du même
+    répertoire puis os.replace : un lecteur voit l'ancien ou le nouveau
+    contenu, jamais un fichier tronqué, même après un crash.
+    """
+    import tempfile  # différé : les commandes en lecture n'en ont pas besoin
+    directory = os.path.dirname(path) or '.'
+    fd, tmp_path = tempfile.mkstemp(prefix='.tmp_', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            if fsync:
+                fsync_file(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    if fsync:
+        fsync_dir(directory)
+
+
+class LockError(RuntimeError):
+    """Le dépôt est verrouillé par un autre processus."""
+
+
+class RepoLock:
+    """
+    Verrou d'écriture du dépôt : fichier .mini_vcs/lock créé de façon
+    exclusive (O_EXCL) et contenant le PID du propriétaire.
+    Un seul processus écrit à la fois ; les lecteurs ne le prennent
+    jamais (les écritures se font par renommage atomique ou ajout en
+    fin de fichier). Réentrant au sein d'un même processus.
+    """
+
+    def __init__(self, vcs_dir: str, timeout: float = LOCK_TIMEOUT):
+        self.path = os.path.join(vcs_dir, LOCK_NAME)
+        self.timeout = timeout
+        self._depth = 0
+        # Vrai si le fichier de verrou a été créé par ce processus
+        self._owned = False
+
+    def acquire(self, blocking: bool = True) -> bool:
+        if self._depth:
+            self._depth += 1
+            return True
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                fd = os.open(self.path,
+                             os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+            except FileNotFoundError:
+                # Pas encore de .mini_vcs/ : rien à protéger (la commande
+                # signalera elle-même le dépôt non initialisé)
+                self._depth = 1
+                self._owned = False
+                return True
+            except FileExistsError:
+                if self._break_stale():
+                    continue
+                if not blocking:
+                    return False
+                if time.monotonic() >= deadline:
+                    raise LockError(
+                        f"Dépôt verrouillé par un autre processus "
+                        f"({self.path}). Supprimez ce fichier si aucune "
+                        "commande n'est en cours."
+                    )
+                time.sleep(LOCK_POLL)
+                continue
+            with os.fdopen(fd, 'w') as f:
+                f.write(str(os.getpid()))
+            self._depth = 1
+            self._owned = True
+            return True
+
+    def release(self):
+        self._depth -= 1
+        if self._depth == 0 and self._owned:
+            self._owned = False
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+
+    def _break_stale(self) -> bool:
+        """Supprime le verrou d'un processus qui n'existe plus (POSIX
+        seulement : ailleurs, os.kill ne sert pas à tester un PID)."""
+        if os.name != 'posix':
+            return False
+        try:
+            with open(self.path, 'r') as f:
+                pid = int(f.read().strip() or 0)
+        except (FileNotFoundError, ValueError):
+            # Verrou en cours de création ou déjà libéré
+            return False
+        if pid <= 0:
+            return False
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+            return True
+        except PermissionError:
+            pass
+        return False
+
+    def __enter__(self) -> 'RepoLock':
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+def locked(method):
+    """Exécute une méthode en tenant le verrou d'écriture du dépôt
+    (l'objet doit fournir `lock()`)."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.lock():
+            return method(self, *args, **kwargs)
+    return wrapper
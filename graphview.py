@@ -0,0 +1,97 @@
+# graphview.py
+from typing import Dict, List, Optional, Tuple
+
+
+def refs_by_commit(refs: Dict[str, Optional[str]]) -> Dict[str, List[str]]:
+    """Index inversé commit -> branches, construit une fois (O(branches))
+    au lieu de parcourir toutes les refs pour chaque commit."""
+    by_commit: Dict[str, List[str]] = {}
+    for name, commit_id in sorted(refs.items()):
+        if commit_id:
+            by_commit.setdefault(commit_id, []).append(name)
+    return by_commit
+
+
+class LaneRenderer:
+    """
+    Dessin ASCII du DAG en colonnes ("lanes"), à la manière de
+    `git log --graph`. Les commits sont fournis un par un, enfants avant
+    parents ; chaque colonne attend le prochain commit de sa lignée.
+    La mémoire ne dépend que du nombre de lignées ouvertes, pas de la
+    taille de l'historique.
+    """
+
+    def __init__(self):
+        # Commit attendu dans chaque colonne (None : colonne libre)
+        self.lanes: List[Optional[str]] = []
+
+    @staticmethod
+    def _row(cells: List[str], links: Dict[int, str] = None) -> str:
+        """Une ligne du dessin : la colonne i occupe le caractère 2i, les
+        liens obliques ('/', '\\') se placent entre deux colonnes."""
+        chars = list(' '.join(cells)) + [' ']
+        for position, char in (links or {}).items():
+            chars[position] = char
+        return ''.join(chars).rstrip()
+
+    def _cells(self) -> List[str]:
+        return ['|' if lane is not None else ' ' for lane in self.lanes]
+
+    def add(self, commit_id: str,
+            parents: List[str]) -> Tuple[List[str], str, List[str]]:
+        """
+        Place un commit et renvoie (lignes avant, ligne du commit,
+        lignes après) : jonctions des lignées qui aboutissent à ce
+        commit, ligne portant le '*' (le texte du commit s'y ajoute),
+        puis départs des parents supplémentaires d'un merge.
+        """
+        columns = [i for i, lane in enumerate(self.lanes)
+                   if lane == commit_id]
+        before = []
+        if columns:
+            column = columns[0]
+            # Autres colonnes qui attendaient ce commit : elles le
+            # rejoignent
+            joining = columns[1:]
+            if joining:
+                for i in joining:
+                    self.lanes[i] = None
+                before.append(self._row(
+                    self._cells(), {2 * i - 1: '/' for i in joining}
+                ))
+                self._trim()
+        else:
+            # Tête de lignée : première colonne libre
+            if None in self.lanes:
+                column = self.lanes.index(None)
+                self.lanes[column] = commit_id
+            else:
+                column = len(self.lanes)
+                self.lanes.append(commit_id)
+
+        cells = self._cells()
+        cells[column] = '*'
+        commit_row = self._row(cells)
+
+        # Premier parent : même colonne ; parents suivants (merge) :
+        # nouvelle colonne à droite, sauf s'ils sont déjà attendus
+        after = []
+        self.lanes[column] = parents[0] if parents else None
+        for parent in parents[1:]:
+            if parent in self.lanes:
+                continue
+            # Les colonnes à droite se décalent d'un cran
+            shifted = [i + 1 for i in range(column + 1, len(self.lanes))
+                       if self.lanes[i] is not None]
+            self.lanes.insert(column + 1, parent)
+            links = {2 * i - 1: '\\' for i in [column + 1] + shifted}
+            cells = self._cells()
+            for i in [column + 1] + shifted:
+                cells[i] = ' '
+            after.append(self._row(cells, links))
+        self._trim()
+        return before, commit_row, after
+
+    def _trim(self):
+        while self.lanes and self.lanes[-1] is None:
+            self.lanes.pop()
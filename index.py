@@ -0,0 +1,218 @@
+# index.py
+import os
+import struct
+from collections import namedtuple
+from typing import Dict, List, Optional
+
+from fsutil import atomic_write, fsync_file
+
+INDEX_MAGIC = b'MVIN'
+INDEX_VERSION = 1
+
+# magic, version, nombre d'entrées
+HEADER = struct.Struct('>4sII')
+# mtime_ns, taille, inode, hash (SHA-1 binaire), longueur du chemin
+ENTRY = struct.Struct('>qQQ20sH')
+
+# Journal (index.journal) : opération puis les mêmes champs qu'une entrée
+JOURNAL_ENTRY = struct.Struct('>BqQQ20sH')
+OP_SET = 1
+OP_REMOVE = 2
+# Au-delà de ce nombre d'enregistrements, le journal est fusionné dans
+# l'index
+JOURNAL_MAX_ENTRIES = 4096
+
+IndexEntry = namedtuple(
+    'IndexEntry', ['path', 'hash', 'size', 'mtime_ns', 'ino']
+)
+
+
+class Index:
+    """
+    Index binaire (remplace staging.json) : l'arbre qui sera commité,
+    avec pour chaque chemin suivi son hash et les données `stat` du
+    fichier au moment où il a été haché. Un fichier dont le stat n'a pas
+    bougé n'a pas besoin d'être relu.
+
+    Les modifications sont d'abord ajoutées en fin de journal
+    (`flush`, coût proportionnel au nombre de chemins modifiés) ;
+    l'index complet n'est réécrit que par `save`, quand le journal
+    devient trop long ou lors d'un commit.
+    """
+
+    def __init__(self, path: str, fsync: bool = True):
+        self.path = path
+        self.fsync = fsync
+        self.journal_path = path + '.journal'
+        self.entries: Dict[str, IndexEntry] = {}
+        # mtime de l'index au chargement (détection des entrées "racy")
+        self.stamp = 0
+        # Enregistrements déjà présents dans le journal, mtime du
+        # journal et chemins qu'il a modifiés
+        self.journal_count = 0
+        self.journal_stamp = 0
+        self._journaled = set()
+        # Modifications pas encore écrites : (opération, entrée)
+        self._pending: List = []
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def load(self) -> 'Index':
+        self.entries = {}
+        self.journal_count = 0
+        self._journaled = set()
+        self._pending = []
+        if not self.exists():
+            return self
+        with open(self.path, 'rb') as f:
+            self.stamp = os.fstat(f.fileno()).st_mtime_ns
+            data = f.read()
+        magic, _version, count = HEADER.unpack_from(data, 0)
+        if magic != INDEX_MAGIC:
+            raise ValueError(f"Index invalide : {self.path}")
+        pos = HEADER.size
+        for _ in range(count):
+            mtime_ns, size, ino, raw_hash, path_len = ENTRY.unpack_from(
+                data, pos
+            )
+            pos += ENTRY.size
+            path = data[pos:pos + path_len].decode('utf-8')
+            pos += path_len
+            self.entries[path] = IndexEntry(path, raw_hash.hex(), size,
+                                            mtime_ns, ino)
+        self._replay_journal()
+        return self
+
+    def copy(self) -> 'Index':
+        """Copie indépendante (les entrées sont immuables)."""
+        other = Index(self.path, self.fsync)
+        other.entries = dict(self.entries)
+        other.stamp = self.stamp
+        other.journal_count = self.journal_count
+        other.journal_stamp = self.journal_stamp
+        other._journaled = set(self._journaled)
+        return other
+
+    def _replay_journal(self):
+        """Applique le journal par-dessus l'index chargé."""
+        try:
+            with open(self.journal_path, 'rb') as f:
+                self.journal_stamp = os.fstat(f.fileno()).st_mtime_ns
+                data = f.read()
+        except FileNotFoundError:
+            return
+        pos = 0
+        while pos + JOURNAL_ENTRY.size <= len(data):
+            op, mtime_ns, size, ino, raw_hash, path_len = (
+                JOURNAL_ENTRY.unpack_from(data, pos)
+            )
+            end = pos + JOURNAL_ENTRY.size + path_len
+            if end > len(data):
+                # Dernier enregistrement tronqué (écriture interrompue)
+                break
+            path = data[pos + JOURNAL_ENTRY.size:end].decode('utf-8')
+            pos = end
+            self._journaled.add(path)
+            if op == OP_SET:
+                self.entries[path] = IndexEntry(path, raw_hash.hex(), size,
+                                                mtime_ns, ino)
+            elif op == OP_REMOVE:
+                self.entries.pop(path, None)
+            else:
+                raise ValueError(f"Journal d'index invalide : "
+                                 f"{self.journal_path}")
+            self.journal_count += 1
+
+    def flush(self):
+        """
+        Écrit les modifications en attente à la fin du journal.
+        L'index est réécrit entièrement s'il n'existe pas encore ou si
+        le journal dépasse JOURNAL_MAX_ENTRIES enregistrements.
+        """
+        if not self.exists() or (self.journal_count + len(self._pending)
+                                 > JOURNAL_MAX_ENTRIES):
+            self.save()
+            return
+        if not self._pending:
+            return
+        records = []
+        for op, entry in self._pending:
+            encoded = entry.path.encode('utf-8')
+            records.append(JOURNAL_ENTRY.pack(
+                op, entry.mtime_ns, entry.size, entry.ino,
+                bytes.fromhex(entry.hash), len(encoded)
+            ))
+            records.append(encoded)
+        with open(self.journal_path, 'ab') as f:
+            f.write(b''.join(records))
+            if self.fsync:
+                fsync_file(f)
+        self.journal_stamp = os.stat(self.journal_path).st_mtime_ns
+        self._journaled.update(entry.path for _, entry in self._pending)
+        self.journal_count += len(self._pending)
+        self._pending = []
+
+    def save(self):
+        """
+        Réécrit l'index (trié par chemin) de façon atomique et vide le
+        journal.
+        """
+        records = [HEADER.pack(INDEX_MAGIC, INDEX_VERSION,
+                               len(self.entries))]
+        for path in sorted(self.entries):
+            entry = self.entries[path]
+            encoded = path.encode('utf-8')
+            records.append(ENTRY.pack(entry.mtime_ns, entry.size, entry.ino,
+                                      bytes.fromhex(entry.hash),
+                                      len(encoded)))
+            records.append(encoded)
+        atomic_write(self.path, b''.join(records), self.fsync)
+        self.stamp = os.stat(self.path).st_mtime_ns
+        # Son contenu est désormais dans l'index ; le rejouer sur le
+        # nouvel index (après une interruption) ne changerait rien
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+        self.journal_count = 0
+        self._journaled = set()
+        self._pending = []
+
+    def set(self, path: str, file_hash: str,
+            st: Optional[os.stat_result] = None):
+        """
+        Enregistre un chemin. Sans `st`, le stat est laissé à zéro : le
+        fichier sera rehaché au prochain status.
+        """
+        if st is None:
+            entry = IndexEntry(path, file_hash, 0, 0, 0)
+        else:
+            entry = IndexEntry(path, file_hash, st.st_size,
+                               st.st_mtime_ns, st.st_ino)
+        self.entries[path] = entry
+        self._pending.append((OP_SET, entry))
+
+    def remove(self, path: str):
+        if self.entries.pop(path, None) is not None:
+            self._pending.append(
+                (OP_REMOVE, IndexEntry(path, '0' * 40, 0, 0, 0))
+            )
+
+    def tree(self) -> Dict[str, Dict]:
+        """Arbre au format des commits : {chemin: {'hash': ...}}."""
+        return {path: {'hash': entry.hash}
+                for path, entry in self.entries.items()}
+
+    def stat_matches(self, entry: IndexEntry, st: os.stat_result) -> bool:
+        """
+        Vrai si le fichier n'a pas changé depuis son hachage.
+        Une entrée modifiée dans la même tranche de temps que l'écriture
+        de l'index (ou du journal qui l'a enregistrée) est considérée
+        douteuse et sera rehachée.
+        """
+        stamp = (self.journal_stamp if entry.path in self._journaled
+                 else self.stamp)
+        return (entry.mtime_ns != 0
+                and entry.size == st.st_size
+                and entry.mtime_ns == st.st_mtime_ns
+                and entry.ino == st.st_ino
+                and entry.mtime_ns < stamp)
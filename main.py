@@ -1,10 +1,37 @@
 # main.py
 import sys
 import os
-import argparse
-from core import VersionControl
-from branches import BranchManager
-from cli import EnhancedCLI
+import time
+
+# Début du démarrage : les modules du VCS sont importés plus tard, à la
+# demande
+_START = time.perf_counter()
+
+# Commandes exécutables directement : python main.py <commande> [args]
+ONE_SHOT_COMMANDS = (
+    'init', 'add', 'commit', 'status', 'log', 'graph', 'branch', 'merge',
+    'repack', 'gc', 'fsck', 'stats', 'diff', 'blame', 'annotate',
+)
+# Options globales, placées avant ou après la commande
+GLOBAL_FLAGS = ('--timing', '--stats')
+
+
+def split_options(argv):
+    """Sépare les options globales (--timing, --stats,
+    --profile[=FICHIER]) de la commande ; renvoie (options, commande).
+    `options['profile']` : None, '' (profil affiché) ou un chemin."""
+    options = {'timing': False, 'stats': False, 'profile': None}
+    command = []
+    for arg in argv:
+        if arg in GLOBAL_FLAGS:
+            options[arg[2:]] = True
+        elif arg == '--profile':
+            options['profile'] = ''
+        elif arg.startswith('--profile='):
+            options['profile'] = arg[len('--profile='):]
+        else:
+            command.append(arg)
+    return options, command
 
 
 def scenario_demo():
@@ -12,6 +39,9 @@ def scenario_demo():
     Scénario automatisé pour démontrer les fonctionnalités sans
     taper de commandes.
     """
+    from core import VersionControl
+    from branches import BranchManager
+
     print("--- Démarrage du scénario de démo ---\n")
 
     # 0. Nettoyage (pour la démo uniquement)
@@ -63,23 +93,113 @@ def scenario_demo():
     print("\n--- Fin du scénario ---")
 
 
+def run_command(argv) -> int:
+    """
+    Exécute une seule commande, sans shell interactif (cmd.Cmd n'est
+    pas construit) ; renvoie le code de sortie. Avec --timing, le temps
+    de démarrage et celui de la commande sont affichés sur stderr ; avec
+    --stats, les compteurs de la commande ; avec --profile, le profil
+    cProfile des fonctions les plus coûteuses.
+    Si un démon tourne pour ce dépôt (`daemon start`), la commande lui
+    est transmise et profite de son état déjà en mémoire (sauf
+    --profile et --stats, qui mesurent ce processus).
+    """
+    options, argv = split_options(argv)
+    timing = options['timing']
+    local = options['stats'] or options['profile'] is not None
+
+    import daemon
+    # Un merge interactif a besoin du terminal : toujours exécuté ici
+    if not local and argv[0] in daemon.DAEMON_COMMANDS and not (
+            argv[0] == 'merge' and '--no-interactive' not in argv):
+        started = time.perf_counter()
+        reply = daemon.call(argv, color=sys.stdout.isatty())
+        if reply is not None:
+            output, exit_code = reply
+            sys.stdout.write(output)
+            if timing:
+                finished = time.perf_counter()
+                print(f"⏱  démarrage : {(started - _START) * 1000:.1f} ms, "
+                      f"commande (démon) : "
+                      f"{(finished - started) * 1000:.1f} ms",
+                      file=sys.stderr)
+            return exit_code
+
+    import colors
+    # Pas de codes couleur (ni d'import de colorama) dans un pipe
+    colors.enable_for(sys.stdout)
+    from commands import VCSCommands
+
+    commands = VCSCommands()
+    profiler = None
+    if options['profile'] is not None:
+        import cProfile
+        profiler = cProfile.Profile()
+    line = ' '.join(argv)
+    commands._begin_command(line)
+    started = time.perf_counter()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        getattr(commands, f"do_{argv[0]}")(' '.join(argv[1:]))
+    finally:
+        if profiler is not None:
+            profiler.disable()
+    finished = time.perf_counter()
+    measured = commands._end_command()
+
+    if timing:
+        print(f"⏱  démarrage : {(started - _START) * 1000:.1f} ms, "
+              f"commande : {(finished - started) * 1000:.1f} ms",
+              file=sys.stderr)
+    if options['stats'] and measured:
+        from metrics import format_counters
+        print(format_counters(measured['counters']), file=sys.stderr)
+    if profiler is not None:
+        from metrics import print_profile
+        print_profile(profiler, options['profile'] or None)
+    return commands.exit_code
+
+
 def main():
+    options, command = split_options(sys.argv[1:])
+    if command and command[0] in ONE_SHOT_COMMANDS:
+        sys.exit(run_command(sys.argv[1:]))
+    if command and command[0] == 'daemon':
+        import daemon
+        sys.exit(daemon.main(command[1:]))
+
+    import argparse
     parser = argparse.ArgumentParser(
         description="Mini VCS - Outil pédagogique"
     )
+    parser.add_argument(
+        '--profile',
+        nargs='?',
+        const='',
+        metavar='FICHIER',
+        help="Profiler chaque commande du shell (cProfile)"
+    )
     parser.add_argument(
         '--demo',
         action='store_true',
         help="Lancer le scénario de démonstration"
     )
+    parser.epilog = (
+        "Commande unique : main.py [--timing] [--stats] "
+        "[--profile[=FICHIER]] <commande> [args] avec "
+        "<commande> parmi " + ", ".join(ONE_SHOT_COMMANDS)
+        + ". Démon : main.py daemon start|stop|status|run"
+    )
     args = parser.parse_args()
 
     if args.demo:
         scenario_demo()
     else:
         # Mode interactif par défaut
+        from cli import EnhancedCLI
         try:
-            cli = EnhancedCLI()
+            cli = EnhancedCLI(profile=args.profile)
             cli.cmdloop()
         except KeyboardInterrupt:
             print("\nInterruption clavier. Sortie.")
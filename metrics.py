@@ -0,0 +1,63 @@
+# metrics.py
+import sys
+from collections import Counter
+from typing import Dict, Optional
+
+# Compteurs du processus, incrémentés sur les chemins chauds de core.py,
+# branches.py et storage.py ; une commande lit la différence entre deux
+# instantanés (voir VCSCommands.stats)
+COUNTERS = Counter()
+
+# Noms des compteurs, dans l'ordre d'affichage de `stats`
+COUNTER_NAMES = (
+    'json_loads',         # fichiers JSON lus sur le disque
+    'json_cache_hits',    # lectures JSON servies par le cache de session
+    'json_saves',         # fichiers JSON écrits
+    'commits_loaded',     # commits décodés depuis le disque ou un pack
+    'commit_cache_hits',  # commits servis par le cache LRU
+    'commits_written',
+    'objects_read',       # objets (blobs) relus
+    'objects_written',    # objets réellement créés
+    'files_hashed',       # fichiers du répertoire de travail hachés
+    'bytes_read',         # octets lus (fichiers, objets, packs)
+    'bytes_written',      # octets écrits (objets, fichiers restaurés)
+    'refs_saved',         # mises à jour de refs.json
+    'files_merged',       # fusions ligne à ligne (merge3)
+    'files_diffed',       # diffs calculés (hors cache)
+    'diff_cache_hits',    # diffs servis par le cache LRU
+)
+
+
+def count(name: str, amount: int = 1):
+    COUNTERS[name] += amount
+
+
+def snapshot() -> Dict[str, int]:
+    return dict(COUNTERS)
+
+
+def delta(before: Dict[str, int]) -> Dict[str, int]:
+    """Compteurs depuis l'instantané `before` (valeurs non nulles)."""
+    return {name: value - before.get(name, 0)
+            for name, value in COUNTERS.items()
+            if value != before.get(name, 0)}
+
+
+def format_counters(counters: Dict[str, int], indent: str = '  ') -> str:
+    """Compteurs non nuls, un par ligne, dans l'ordre de COUNTER_NAMES."""
+    names = list(COUNTER_NAMES) + sorted(set(counters) - set(COUNTER_NAMES))
+    return '\n'.join(f"{indent}{name:<18} {counters[name]}"
+                     for name in names if counters.get(name))
+
+
+def print_profile(profiler, path: Optional[str] = None, limit: int = 25,
+                  stream=None):
+    """Affiche les fonctions les plus coûteuses (temps cumulé) d'un
+    cProfile.Profile ; `path` : fichier .prof pour pstats / snakeviz."""
+    import pstats  # différé : seulement avec --profile
+    stream = stream or sys.stderr
+    if path:
+        profiler.dump_stats(path)
+        print(f"📈 Profil enregistré dans {path}", file=stream)
+    stats = pstats.Stats(profiler, stream=stream)
+    stats.sort_stats('cumulative').print_stats(limit)
@@ -0,0 +1,294 @@
+# storage.py
+import os
+import mmap
+import struct
+import zlib
+import hashlib
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from fsutil import atomic_write, fsync_file
+from metrics import count
+
+# Types d'objets stockés dans un packfile
+OBJ_COMMIT = 1
+OBJ_BLOB = 2
+OBJ_DELTA = 3
+
+PACK_MAGIC = b'MVPK'
+IDX_MAGIC = b'MVIX'
+PACK_VERSION = 1
+
+# En-tête commun : magic, version, nombre d'objets
+HEADER = struct.Struct('>4sII')
+# Entrée du packfile : type, taille décompressée, taille compressée
+ENTRY = struct.Struct('>BQI')
+# Une entrée delta est suivie de l'offset de sa base dans le même pack
+DELTA_BASE = struct.Struct('>Q')
+# Enregistrement de l'index (largeur fixe, trié par hash)
+IDX_RECORD = struct.Struct('>20sBQ')
+
+# Opérations d'un delta : copie depuis la base ou insertion littérale
+DELTA_COPY = b'C'
+DELTA_INSERT = b'I'
+COPY_OP = struct.Struct('>QI')
+INSERT_OP = struct.Struct('>I')
+
+# Au-delà, on stocke l'objet complet pour borner le coût de lecture
+MAX_DELTA_DEPTH = 16
+
+
+def make_delta(base: bytes, target: bytes) -> bytes:
+    """
+    Encode `target` comme une suite de copies depuis `base` et
+    d'insertions. Le découpage se fait par lignes, ce qui convient
+    aux fichiers texte successifs d'un même chemin.
+    """
+    import difflib  # différé : seul repack en a besoin
+    base_lines = base.splitlines(keepends=True)
+    target_lines = target.splitlines(keepends=True)
+
+    # Offsets en octets du début de chaque ligne
+    base_offsets = [0]
+    for line in base_lines:
+        base_offsets.append(base_offsets[-1] + len(line))
+    target_offsets = [0]
+    for line in target_lines:
+        target_offsets.append(target_offsets[-1] + len(line))
+
+    ops = []
+    matcher = difflib.SequenceMatcher(None, base_lines, target_lines,
+                                      autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            start = base_offsets[i1]
+            length = base_offsets[i2] - start
+            ops.append(DELTA_COPY + COPY_OP.pack(start, length))
+        elif j2 > j1:
+            data = target[target_offsets[j1]:target_offsets[j2]]
+            ops.append(DELTA_INSERT + INSERT_OP.pack(len(data)) + data)
+    return b''.join(ops)
+
+
+def apply_delta(base: bytes, delta: bytes) -> bytes:
+    """Reconstruit l'objet cible à partir de sa base et du delta."""
+    out = []
+    pos = 0
+    while pos < len(delta):
+        op = delta[pos:pos + 1]
+        pos += 1
+        if op == DELTA_COPY:
+            start, length = COPY_OP.unpack_from(delta, pos)
+            pos += COPY_OP.size
+            out.append(base[start:start + length])
+        elif op == DELTA_INSERT:
+            (length,) = INSERT_OP.unpack_from(delta, pos)
+            pos += INSERT_OP.size
+            out.append(delta[pos:pos + length])
+            pos += length
+        else:
+            raise ValueError("Delta corrompu.")
+    return b''.join(out)
+
+
+class PackWriter:
+    """
+    Écrit un packfile et son index.
+    Les objets sont compressés (zlib) et peuvent être stockés en delta
+    par rapport à un objet déjà écrit dans le même pack.
+    """
+
+    def __init__(self, pack_dir: str):
+        self.pack_dir = pack_dir
+        os.makedirs(pack_dir, exist_ok=True)
+        self.tmp_path = os.path.join(pack_dir, 'tmp_pack')
+        self.file = open(self.tmp_path, 'wb')
+        self.file.write(HEADER.pack(PACK_MAGIC, PACK_VERSION, 0))
+        self.entries: List[Tuple[bytes, int, int]] = []
+        # offset -> profondeur de la chaîne de deltas
+        self.depths: Dict[int, int] = {}
+
+    def add(self, key: str, obj_type: int, data: bytes,
+            base: Optional[Tuple[int, bytes]] = None) -> int:
+        """
+        Ajoute un objet et renvoie son offset dans le pack.
+        `base` = (offset, contenu) d'un objet déjà écrit : on tente
+        alors un delta, conservé seulement s'il est plus petit.
+        """
+        offset = self.file.tell()
+        payload = zlib.compress(data)
+        entry_type = obj_type
+        base_offset = None
+
+        if base is not None and self.depths[base[0]] < MAX_DELTA_DEPTH:
+            delta = zlib.compress(make_delta(base[1], data))
+            if len(delta) < len(payload):
+                payload = delta
+                entry_type = OBJ_DELTA
+                base_offset = base[0]
+
+        self.file.write(ENTRY.pack(entry_type, len(data), len(payload)))
+        if base_offset is not None:
+            self.file.write(DELTA_BASE.pack(base_offset))
+            self.depths[offset] = self.depths[base_offset] + 1
+        else:
+            self.depths[offset] = 0
+        self.file.write(payload)
+
+        # Le type réel (commit/blob) est gardé dans l'index
+        self.entries.append((bytes.fromhex(key), obj_type, offset))
+        return offset
+
+    def finish(self, fsync: bool = True) -> Optional[str]:
+        """
+        Finalise le pack (.pack + .idx) et renvoie son chemin.
+        Avec `fsync`, le pack est sur disque avant que l'appelant ne
+        supprime les objets qu'il remplace.
+        """
+        count = len(self.entries)
+        self.file.seek(0)
+        self.file.write(HEADER.pack(PACK_MAGIC, PACK_VERSION, count))
+        if fsync:
+            fsync_file(self.file)
+        self.file.close()
+
+        if not count:
+            os.remove(self.tmp_path)
+            return None
+
+        self.entries.sort()
+        name = hashlib.sha1(
+            b''.join(key for key, _, _ in self.entries)
+        ).hexdigest()
+        pack_path = os.path.join(self.pack_dir, f"pack-{name}.pack")
+        idx_path = os.path.join(self.pack_dir, f"pack-{name}.idx")
+
+        # Le .pack est mis en place avant le .idx : un index visible
+        # pointe toujours vers un pack complet.
+        os.replace(self.tmp_path, pack_path)
+        atomic_write(idx_path, b''.join(
+            [HEADER.pack(IDX_MAGIC, PACK_VERSION, count)]
+            + [IDX_RECORD.pack(key, obj_type, offset)
+               for key, obj_type, offset in self.entries]
+        ), fsync)
+        return pack_path
+
+
+class Pack:
+    """Lecture d'un packfile via son index trié (recherche binaire)."""
+
+    def __init__(self, idx_path: str):
+        self.idx_path = idx_path
+        self.pack_path = idx_path[:-len('.idx')] + '.pack'
+        with open(idx_path, 'rb') as f:
+            self.idx = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, _version, self.count = HEADER.unpack_from(self.idx, 0)
+        if magic != IDX_MAGIC:
+            raise ValueError(f"Index de pack invalide : {idx_path}")
+
+    def close(self):
+        self.idx.close()
+
+    def _record(self, i: int) -> Tuple[bytes, int, int]:
+        return IDX_RECORD.unpack_from(
+            self.idx, HEADER.size + i * IDX_RECORD.size
+        )
+
+    def entry(self, i: int) -> Tuple[str, int, int]:
+        """(hash, type, offset) du i-ème objet de l'index."""
+        key, obj_type, offset = self._record(i)
+        return key.hex(), obj_type, offset
+
+    def find(self, key: str) -> Optional[Tuple[int, int]]:
+        """Renvoie (type, offset) de l'objet, ou None. O(log n)."""
+        raw = bytes.fromhex(key)
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start = HEADER.size + mid * IDX_RECORD.size
+            mid_key = self.idx[start:start + 20]
+            if mid_key < raw:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.count:
+            rec_key, obj_type, offset = self._record(lo)
+            if rec_key == raw:
+                return obj_type, offset
+        return None
+
+    def keys(self, obj_type: Optional[int] = None) -> Iterator[str]:
+        """Parcourt les hash présents dans le pack (filtrés par type)."""
+        for i in range(self.count):
+            key, rec_type, _ = self._record(i)
+            if obj_type is None or rec_type == obj_type:
+                yield key.hex()
+
+    def read_at(self, offset: int) -> bytes:
+        """Lit l'objet à l'offset donné en résolvant les deltas."""
+        chain = []
+        with open(self.pack_path, 'rb') as f:
+            while True:
+                f.seek(offset)
+                entry_type, _size, comp_len = ENTRY.unpack(
+                    f.read(ENTRY.size)
+                )
+                count('bytes_read', comp_len)
+                if entry_type == OBJ_DELTA:
+                    (base_offset,) = DELTA_BASE.unpack(
+                        f.read(DELTA_BASE.size)
+                    )
+                    chain.append(zlib.decompress(f.read(comp_len)))
+                    offset = base_offset
+                else:
+                    data = zlib.decompress(f.read(comp_len))
+                    break
+        for delta in reversed(chain):
+            data = apply_delta(data, delta)
+        return data
+
+
+class PackStore:
+    """Ensemble des packs d'un dépôt (répertoire packs/)."""
+
+    def __init__(self, pack_dir: str):
+        self.pack_dir = pack_dir
+        self._packs: List[Pack] = []
+        self._stamp = None
+
+    def packs(self) -> List[Pack]:
+        """Liste des packs, rechargée si le répertoire a changé."""
+        try:
+            stamp = os.stat(self.pack_dir).st_mtime_ns
+        except FileNotFoundError:
+            stamp = None
+        if stamp != self._stamp:
+            self.close()
+            if stamp is not None:
+                self._packs = [
+                    Pack(os.path.join(self.pack_dir, name))
+                    for name in sorted(os.listdir(self.pack_dir))
+                    if name.endswith('.idx')
+                ]
+            self._stamp = stamp
+        return self._packs
+
+    def close(self):
+        for pack in self._packs:
+            pack.close()
+        self._packs = []
+
+    def read(self, key: str) -> Optional[Tuple[int, bytes]]:
+        """Renvoie (type, contenu) de l'objet s'il est dans un pack."""
+        for pack in self.packs():
+            found = pack.find(key)
+            if found:
+                obj_type, offset = found
+                return obj_type, pack.read_at(offset)
+        return None
+
+    def contains(self, key: str) -> bool:
+        return any(pack.find(key) for pack in self.packs())
+
+    def keys(self, obj_type: Optional[int] = None) -> Iterator[str]:
+        for pack in self.packs():
+            yield from pack.keys(obj_type)
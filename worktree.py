@@ -0,0 +1,106 @@
+# worktree.py
+import os
+import re
+import fnmatch
+from typing import Iterator, List, Optional, Tuple
+
+IGNORE_FILE = '.mini_vcsignore'
+# Toujours ignorés, même sans fichier .mini_vcsignore
+DEFAULT_IGNORED = ['.mini_vcs/', '.git/', '__pycache__/', '.DS_Store']
+
+
+class IgnoreRules:
+    """
+    Règles d'exclusion (.mini_vcsignore), compilées une seule fois en
+    quelques expressions régulières.
+
+    Syntaxe (sous-ensemble de .gitignore) :
+      - une ligne = un motif fnmatch ; '#' commence un commentaire ;
+      - 'motif/' ne vise que les répertoires ;
+      - un motif sans '/' s'applique au nom, à n'importe quelle
+        profondeur ; avec un '/', au chemin complet depuis la racine.
+    """
+
+    def __init__(self, patterns: List[str]):
+        groups = {
+            (False, False): [], (False, True): [],
+            (True, False): [], (True, True): [],
+        }
+        for pattern in patterns:
+            pattern = pattern.strip()
+            if not pattern or pattern.startswith('#'):
+                continue
+            dir_only = pattern.endswith('/')
+            pattern = pattern.rstrip('/')
+            on_path = '/' in pattern
+            groups[(dir_only, on_path)].append(
+                fnmatch.translate(pattern.lstrip('/'))
+            )
+        self._name_any = self._compile(groups[(False, False)])
+        self._path_any = self._compile(groups[(False, True)])
+        self._name_dir = self._compile(groups[(True, False)])
+        self._path_dir = self._compile(groups[(True, True)])
+
+    @staticmethod
+    def _compile(regexes: List[str]):
+        if not regexes:
+            return None
+        return re.compile('|'.join(f'(?:{r})' for r in regexes))
+
+    @classmethod
+    def from_repo(cls, repo_path: str) -> 'IgnoreRules':
+        patterns = list(DEFAULT_IGNORED)
+        path = os.path.join(repo_path, IGNORE_FILE)
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                patterns.extend(f.read().splitlines())
+        return cls(patterns)
+
+    def ignored(self, rel_path: str, name: str, is_dir: bool) -> bool:
+        for regex, target in ((self._name_any, name),
+                              (self._path_any, rel_path)):
+            if regex is not None and regex.match(target):
+                return True
+        if is_dir:
+            for regex, target in ((self._name_dir, name),
+                                  (self._path_dir, rel_path)):
+                if regex is not None and regex.match(target):
+                    return True
+        return False
+
+
+def walk(repo_path: str, rules: IgnoreRules,
+         start: str = '') -> Iterator[Tuple[str, os.stat_result]]:
+    """
+    Parcourt récursivement le répertoire de travail avec os.scandir.
+    Produit (chemin relatif avec '/', stat) pour chaque fichier non
+    ignoré. Les répertoires ignorés sont écartés avant d'y descendre, et
+    le stat vient directement de l'entrée DirEntry.
+    """
+    stack = [start]
+    while stack:
+        rel_dir = stack.pop()
+        try:
+            iterator = os.scandir(os.path.join(repo_path, rel_dir))
+        except (FileNotFoundError, NotADirectoryError, PermissionError):
+            continue
+        with iterator:
+            for entry in iterator:
+                rel = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    if not rules.ignored(rel, entry.name, True):
+                        stack.append(rel)
+                elif entry.is_file(follow_symlinks=False):
+                    if not rules.ignored(rel, entry.name, False):
+                        yield rel, entry.stat(follow_symlinks=False)
+
+
+def relative_path(repo_path: str, path: str) -> Optional[str]:
+    """Chemin relatif à la racine du dépôt (séparateur '/'), ou None
+    si `path` est en dehors du dépôt."""
+    rel = os.path.relpath(os.path.join(repo_path, path), repo_path)
+    if rel == os.curdir:
+        return ''
+    if rel.startswith(os.pardir):
+        return None
+    return rel.replace(os.sep, '/')